@@ -1,6 +1,7 @@
 from setuptools import setup
 
 extras_require = {}
+extras_require["arrow"] = ["pyarrow>=7.0.0"]
 extras_require["lint"] = sorted({"flake8", "black"})
 extras_require["test"] = sorted(
     {
@@ -10,6 +11,7 @@ extras_require["test"] = sorted(
         "pytest-console-scripts~=0.2",
         "pytest-mock~=3.0",
     }
+    | set(extras_require["arrow"])
 )
 extras_require["develop"] = sorted(
     set(
@@ -1,7 +1,35 @@
+import importlib
+
 from heputils import convert
+from heputils import output
 from heputils import plot
+from heputils import shared
+from heputils import trace
 from heputils import utils
 from heputils.version import __version__
 
+# Imported on first use as they import scipy.stats, awkward, or uproot, which
+# would slow down the startup of the CLI
+_lazy_modules = ["batch", "benchmark", "live", "stats", "watch"]
+
 # Satisfy pyflakes
-__all__ = ["__version__", "plot", "convert", "utils"]
+__all__ = [
+    "__version__",
+    "batch",
+    "benchmark",
+    "plot",
+    "convert",
+    "live",
+    "output",
+    "shared",
+    "stats",
+    "trace",
+    "utils",
+    "watch",
+]
+
+
+def __getattr__(name):
+    if name in _lazy_modules:
+        return importlib.import_module(f"heputils.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,244 @@
+"""Render collections of plots from named histograms."""
+
+import json
+import multiprocessing
+import os
+
+import matplotlib.pyplot as plt
+
+from heputils import output
+from heputils import plot
+from heputils import shared
+
+_plot_types = {
+    "data": plot.data_hist,
+    "shape": plot.shape_hist,
+    "stack": plot.stack_hist,
+    "stack_ratio": plot.stack_ratio_plot,
+}
+
+
+def load_specs(path):
+    """
+    Load plot specifications from a JSON file.
+
+    The file maps plot names to specifications of the form
+
+    .. code-block:: json
+
+        {
+            "jet_mass": {
+                "type": "stack_ratio",
+                "hists": ["ttbar", "wjets", "other"],
+                "data": "data",
+                "kwargs": {"labels": ["ttbar", "W+jets", "Other"]}
+            }
+        }
+
+    where ``type`` is one of ``"data"``, ``"shape"``, ``"stack"``, or
+    ``"stack_ratio"``, ``hists`` names the input histograms, and the optional
+    ``data`` and ``kwargs`` are passed through to the plot function.
+
+    Args:
+        path (str): Path to the JSON file
+
+    Returns:
+        dict: The plot specifications keyed by plot name
+    """
+    with open(path) as spec_file:
+        return json.load(spec_file)
+
+
+def required_hists(spec):
+    """
+    Determine the names of the histograms a plot specification depends on.
+
+    Example:
+
+        >>> import heputils
+        >>> spec = {"type": "stack", "hists": ["ttbar", "wjets"], "data": "data"}
+        >>> sorted(heputils.batch.required_hists(spec))
+        ['data', 'ttbar', 'wjets']
+
+    Args:
+        spec (dict): The plot specification
+
+    Returns:
+        set: The names of the required histograms
+    """
+    names = spec["hists"]
+    names = {names} if isinstance(names, str) else set(names)
+    if spec.get("data") is not None:
+        names.add(spec["data"])
+    return names
+
+
+def draw_plot(spec, hists, fig):
+    """
+    Draw a single plot specification on a figure.
+
+    Args:
+        spec (dict): The plot specification
+        hists (dict): The available `hist.Hist` objects keyed by name
+        fig (`matplotlib.figure.Figure`): The figure to draw on
+
+    Returns:
+        `matplotlib.figure.Figure`: The figure drawn on
+    """
+    plot_type = spec.get("type", "stack")
+    if plot_type not in _plot_types:
+        raise ValueError(
+            f"Unknown plot type {plot_type}. Expected one of {sorted(_plot_types)}."
+        )
+
+    kwargs = dict(spec.get("kwargs", {}))
+    names = spec["hists"]
+    plot_hists = hists[names] if isinstance(names, str) else [hists[n] for n in names]
+    if spec.get("data") is not None:
+        kwargs["data_hist"] = hists[spec["data"]]
+
+    if plot_type == "stack_ratio":
+        plot.stack_ratio_plot(plot_hists, fig=fig, **kwargs)
+    else:
+        _plot_types[plot_type](plot_hists, ax=fig.add_subplot(), **kwargs)
+    return fig
+
+
+def render_plot(spec, hists, path, formats=("pdf",), pool=None, saver=None):
+    """
+    Render a single plot specification to file.
+
+    Args:
+        spec (dict): The plot specification
+        hists (dict): The available `hist.Hist` objects keyed by name
+        path (str): The output path without file extension
+        formats (`tuple` of `str`): The file formats to save
+        pool (`heputils.plot.FigurePool`): The pool to take the figure from. If
+            ``None`` a new pool is used.
+        saver (`heputils.output.AsyncSaver`): The saver to write the files in
+            the background with. If ``None`` the files are written before
+            returning.
+
+    Returns:
+        list: The paths of the saved files, or their future if a ``saver`` is
+        given
+    """
+    if pool is None:
+        with plot.FigurePool(max_size=1) as pool:
+            return render_plot(spec, hists, path, formats, pool=pool, saver=saver)
+
+    with pool.figure() as fig:
+        draw_plot(spec, hists, fig)
+        if saver is not None:
+            return saver.save(fig, path, formats=formats)
+        return output.save_figure(fig, path, formats=formats)
+
+
+# The shared histograms and figure pool of a render worker process
+_worker_hists = None
+_worker_pool = None
+
+
+def _init_worker(handles, rc_params, experiment_info):
+    global _worker_hists, _worker_pool
+    plt.rcParams.update(rc_params)
+    plot.set_experiment_info(**experiment_info)
+    plot.warmup()
+    _worker_hists = shared.attach(handles)
+    _worker_pool = plot.FigurePool(max_size=1)
+
+
+def _render_in_worker(name, spec, path, formats):
+    # Only copy the histograms this plot needs out of shared memory
+    hists = {
+        hist_name: _worker_hists[hist_name].to_hist()
+        for hist_name in required_hists(spec)
+    }
+    return name, render_plot(spec, hists, path, formats, pool=_worker_pool)
+
+
+def render(specs, hists, output_dir, formats=("pdf",), processes=None, saver=None):
+    """
+    Render each plot specification to a file in an output directory.
+
+    With ``processes`` the plots are rendered by a pool of worker processes.
+    The histograms are published to shared memory once with
+    ``heputils.shared.HistogramPublisher`` rather than pickled for each plot,
+    and workers use the current style and experiment information.
+
+    Args:
+        specs (dict): The plot specifications keyed by plot name
+        hists (dict): The available `hist.Hist` objects keyed by name
+        output_dir (str): The directory to write the plots to
+        formats (`tuple` of `str`): The file formats to save
+        processes (int): The number of worker processes. If ``None`` render in
+            this process.
+        saver (`heputils.output.AsyncSaver`): The saver to write the files in
+            the background with while the next plots are rendered. Can not be
+            combined with ``processes``.
+
+    Returns:
+        dict: The paths of the saved files keyed by plot name
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if processes is not None and saver is not None:
+        raise ValueError("A saver can not be used with worker processes.")
+    if plot.get_experiment_info()["name"] is None:
+        raise ValueError(
+            "No experiment style is set. Set one with heputils.plot.set_style."
+        )
+    if processes is not None:
+        needed = set().union(*(required_hists(spec) for spec in specs.values()))
+        with shared.HistogramPublisher(
+            {name: hists[name] for name in needed}
+        ) as publisher:
+            initargs = (
+                publisher.handles,
+                dict(plt.rcParams),
+                dict(plot.get_experiment_info()),
+            )
+            with multiprocessing.Pool(
+                processes, initializer=_init_worker, initargs=initargs
+            ) as pool:
+                tasks = [
+                    (name, spec, os.path.join(output_dir, name), formats)
+                    for name, spec in specs.items()
+                ]
+                return dict(pool.starmap(_render_in_worker, tasks))
+
+    with plot.FigurePool(max_size=1) as pool:
+        rendered = {
+            name: render_plot(
+                spec,
+                hists,
+                os.path.join(output_dir, name),
+                formats,
+                pool=pool,
+                saver=saver,
+            )
+            for name, spec in specs.items()
+        }
+    if saver is not None:
+        rendered = {name: future.result() for name, future in rendered.items()}
+    return rendered
+
+
+def render_book(specs, hists, path, index=True):
+    """
+    Render each plot specification as a page of a single multipage PDF.
+
+    Args:
+        specs (dict): The plot specifications keyed by plot name
+        hists (dict): The available `hist.Hist` objects keyed by name
+        path (str): The path of the PDF file to write
+        index (bool): If ``True`` append index pages listing the plot names
+
+    Returns:
+        int: The number of pages written, including index pages
+    """
+    with plot.FigurePool(max_size=1) as pool, output.PdfBook(path, index=index) as book:
+        for name, spec in specs.items():
+            with pool.figure() as fig:
+                draw_plot(spec, hists, fig)
+                book.add(fig, title=name, close=False)
+    return book.n_pages
@@ -0,0 +1,396 @@
+"""Benchmark the hot paths of heputils."""
+
+import json
+import pickle
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import hist
+import matplotlib
+import numpy as np
+from hist import Hist
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from heputils import convert
+from heputils import live
+from heputils import output
+from heputils import plot
+from heputils import shared
+from heputils import utils
+from heputils.version import __version__
+
+# Gamma distribution shapes and scales in GeV that mimic the mass spectra of the
+# example histograms used in the tests, and their relative normalizations
+_sample_shapes = {
+    "ttbar": (6.0, 40.0, 1.0),
+    "wjets": (4.5, 60.0, 0.9),
+    "other": (5.0, 50.0, 0.25),
+    "signal": (5.5, 45.0, 0.07),
+}
+_mass_range = (0.0, 1000.0)
+
+
+def make_hists(n_bins=1000, n_samples=20, n_events=100_000, ndim=1, seed=0):
+    """
+    Make scaled-up versions of the example histograms.
+
+    Example:
+
+        >>> import heputils
+        >>> hists, data_hist = heputils.benchmark.make_hists(n_bins=100, n_samples=8)
+        >>> len(hists), hists[0].axes[0].size
+        (8, 100)
+
+    Args:
+        n_bins (int): The number of bins along each axis
+        n_samples (int): The number of samples, which cycle through the example
+            sample shapes
+        n_events (int): The number of events of the largest sample
+        ndim (int): The number of axes of the histograms
+        seed (int): The random seed
+
+    Returns:
+        tuple: The list of sample histograms and the pseudodata histogram
+    """
+    rng = np.random.default_rng(seed)
+    axes = [
+        hist.axis.Regular(n_bins, *_mass_range, name=f"mass_{idx}", label="mass [GeV]")
+        for idx in range(ndim)
+    ]
+    shapes = list(_sample_shapes.values())
+
+    hists = []
+    for idx in range(n_samples):
+        shape, scale, norm = shapes[idx % len(shapes)]
+        size = (int(n_events * norm), ndim)
+        _hist = Hist(*axes, storage=hist.storage.Weight())
+        _hist.fill(*rng.gamma(shape, scale, size=size).T, weight=1.0)
+        hists.append(_hist)
+
+    data_values = rng.poisson(utils.sum_hists(hists).values())
+    data_hist = Hist(*axes, storage=hist.storage.Double())
+    data_hist[...] = data_values
+    return hists, data_hist
+
+
+def _drawn(plot_function):
+    """
+    Time a plot function on a pooled figure including drawing the figure.
+    """
+    pool = plot.FigurePool(max_size=1)
+
+    def run():
+        with pool.figure() as fig:
+            plot_function(fig)
+            fig.canvas.draw()
+
+    return run
+
+
+def _bench_sum_hists(config):
+    hists, _ = make_hists(**config)
+    return lambda: utils.sum_hists(hists)
+
+
+def _bench_sum_hists_nd(config):
+    config = dict(config, n_bins=max(config["n_bins"] // 20, 1), ndim=3)
+    hists, _ = make_hists(**config)
+    return lambda: utils.sum_hists(hists)
+
+
+def _bench_numpy_to_hist(config):
+    values = np.random.default_rng(0).uniform(size=config["n_bins"])
+    edges = np.linspace(*_mass_range, config["n_bins"] + 1)
+    return lambda: convert.numpy_to_hist(values, edges, name="mass")
+
+
+def _bench_stack_hist(config):
+    hists, data_hist = make_hists(**config)
+    return _drawn(
+        lambda fig: plot.stack_hist(
+            hists, data_hist=data_hist, ax=fig.add_subplot(), xlabel="mass [GeV]"
+        )
+    )
+
+
+def _bench_shape_hist(config):
+    hists, _ = make_hists(**config)
+    return _drawn(lambda fig: plot.shape_hist(hists, ax=fig.add_subplot()))
+
+
+def _bench_shape_hist_overlay(config):
+    hists, _ = make_hists(**config)
+    return _drawn(
+        lambda fig: plot.shape_hist(hists, ax=fig.add_subplot(), overlay=True)
+    )
+
+
+def _bench_data_hist(config):
+    _, data_hist = make_hists(**config)
+    return _drawn(lambda fig: plot.data_hist(data_hist, ax=fig.add_subplot()))
+
+
+def _bench_stack_ratio_plot(config):
+    hists, data_hist = make_hists(**config)
+    return _drawn(
+        lambda fig: plot.stack_ratio_plot(
+            hists, data_hist=data_hist, fig=fig, xlabel="mass [GeV]"
+        )
+    )
+
+
+def _bench_hist2d(config):
+    hists, _ = make_hists(**dict(config, n_samples=1, ndim=2))
+    return _drawn(lambda fig: plot.hist2d(hists[0], ax=fig.add_subplot()))
+
+
+def _bench_draw_experiment_label(config):
+    _, data_hist = make_hists(**config)
+    max_height = data_hist.values().max()
+    return _drawn(
+        lambda fig: plot.draw_experiment_label(
+            fig.add_subplot(), max_height=max_height, logy=True
+        )
+    )
+
+
+def _bench_style_context(config):
+    def run():
+        with plot.style_context("CMS"):
+            pass
+
+    return run
+
+
+def _bench_pdf_book(config, n_plots=4):
+    hists, data_hist = make_hists(**config)
+    pool = plot.FigurePool(max_size=1)
+
+    def run():
+        with output.PdfBook(_null_path(), index=True) as book:
+            for idx in range(n_plots):
+                with pool.figure() as fig:
+                    plot.stack_hist(hists, data_hist=data_hist, ax=fig.add_subplot())
+                    book.add(fig, title=f"plot {idx}", close=False)
+
+    return run
+
+
+def _bench_pdf_per_file(config, n_plots=4):
+    hists, data_hist = make_hists(**config)
+    pool = plot.FigurePool(max_size=1)
+
+    def run():
+        for _ in range(n_plots):
+            with pool.figure() as fig:
+                plot.stack_hist(hists, data_hist=data_hist, ax=fig.add_subplot())
+                fig.savefig(_null_path(), format="pdf")
+
+    return run
+
+
+def _transport_hists(config):
+    # A few large N-D histograms as sent to multiprocess workers
+    config = dict(config, n_bins=max(config["n_bins"] // 10, 1), n_samples=4, ndim=3)
+    hists, _ = make_hists(**config)
+    return {f"sample_{idx}": _hist for idx, _hist in enumerate(hists)}
+
+
+def _bench_transport_pickle(config):
+    hists = _transport_hists(config)
+    return lambda: pickle.loads(pickle.dumps(hists, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _bench_transport_shared_memory(config):
+    hists = _transport_hists(config)
+
+    def run():
+        # Publishing happens once no matter how many workers attach
+        with shared.HistogramPublisher(hists) as publisher:
+            handles = pickle.dumps(publisher.handles, protocol=pickle.HIGHEST_PROTOCOL)
+            shared_hists = shared.attach(pickle.loads(handles))
+            del shared_hists
+            shared.detach()
+
+    return run
+
+
+def _bench_live_fill(config, n_chunks=10, chunk_size=100_000):
+    rng = np.random.default_rng(0)
+    shape, scale, _ = _sample_shapes["ttbar"]
+    chunks = rng.gamma(shape, scale, size=(n_chunks, chunk_size))
+    template = Hist(
+        hist.axis.Regular(config["n_bins"], *_mass_range), storage=hist.storage.Weight()
+    )
+
+    def run():
+        # Publish a snapshot after every chunk as the worst case
+        live_hist = live.LiveHist(template, publish_interval=0)
+        for chunk in chunks:
+            live_hist.fill(chunk)
+
+    return run
+
+
+def _bench_live_update(config):
+    hists, data_hist = make_hists(**config)
+    live_hists = [live.LiveHist(_hist) for _hist in hists]
+    live_data = live.LiveHist(data_hist)
+    for live_hist in live_hists + [live_data]:
+        live_hist.flush()
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    live_plot = live.LivePlot(live_hists, data_hist=live_data, ax=fig.add_subplot())
+    live_plot.update(force=True)
+
+    def run():
+        live_plot.update(force=True)
+        fig.canvas.draw()
+
+    return run
+
+
+def _null_path():
+    # Benchmark the rendering and serialization rather than the disk
+    return "NUL" if sys.platform == "win32" else "/dev/null"
+
+
+benchmarks = {
+    "sum_hists": _bench_sum_hists,
+    "sum_hists_nd": _bench_sum_hists_nd,
+    "numpy_to_hist": _bench_numpy_to_hist,
+    "stack_hist": _bench_stack_hist,
+    "shape_hist": _bench_shape_hist,
+    "shape_hist_overlay": _bench_shape_hist_overlay,
+    "data_hist": _bench_data_hist,
+    "stack_ratio_plot": _bench_stack_ratio_plot,
+    "hist2d": _bench_hist2d,
+    "draw_experiment_label": _bench_draw_experiment_label,
+    "style_context": _bench_style_context,
+    "pdf_book": _bench_pdf_book,
+    "pdf_per_file": _bench_pdf_per_file,
+    "transport_pickle": _bench_transport_pickle,
+    "transport_shared_memory": _bench_transport_shared_memory,
+    "live_fill": _bench_live_fill,
+    "live_update": _bench_live_update,
+}
+if shared.shared_memory is None:  # Python 3.7
+    del benchmarks["transport_shared_memory"]
+
+
+def _measure(run, repeat):
+    # Warm up caches so the first call does not dominate
+    run()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    # Memory is traced in a separate call as tracing slows down execution
+    tracemalloc.start()
+    try:
+        run()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "times": times,
+        "min": min(times),
+        "median": statistics.median(times),
+        "peak_memory": peak_memory,
+    }
+
+
+def run(names=None, repeat=5, n_bins=1000, n_samples=20, style="ATLAS"):
+    """
+    Run benchmarks and collect their wall times and peak traced memory.
+
+    Plot benchmarks time the plot function and drawing the figure with the
+    Agg renderer.
+
+    Args:
+        names (`list` of `str`): The benchmarks to run. Defaults to all of
+            ``heputils.benchmark.benchmarks``.
+        repeat (int): The number of timed runs of each benchmark
+        n_bins (int): The number of bins of the benchmark histograms
+        n_samples (int): The number of samples in the benchmark stacks
+        style (str): The plotting style
+
+    Returns:
+        dict: The benchmark environment, configuration, and results
+    """
+    names = list(benchmarks) if names is None else names
+    unknown = set(names) - set(benchmarks)
+    if unknown:
+        raise ValueError(
+            f"Unknown benchmarks {sorted(unknown)}. Expected any of {list(benchmarks)}."
+        )
+
+    plot.set_style(style)
+    config = {"n_bins": n_bins, "n_samples": n_samples}
+    results = {name: _measure(benchmarks[name](config), repeat) for name in names}
+    return {
+        "heputils": __version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "matplotlib": matplotlib.__version__,
+        "platform": platform.platform(),
+        "config": dict(config, repeat=repeat, style=style),
+        "results": results,
+    }
+
+
+def compare(baseline, results):
+    """
+    Compare benchmark results against a baseline, e.g. of a previous release.
+
+    Args:
+        baseline (dict): The baseline results from ``heputils.benchmark.run``
+        results (dict): The results from ``heputils.benchmark.run``
+
+    Returns:
+        dict: The ratios of the median times and peak memory to the baseline for
+        each benchmark in both
+    """
+    return {
+        name: {
+            "median": result["median"] / baseline["results"][name]["median"],
+            "peak_memory": result["peak_memory"]
+            / max(baseline["results"][name]["peak_memory"], 1),
+        }
+        for name, result in results["results"].items()
+        if name in baseline["results"]
+    }
+
+
+def save(results, path):
+    """
+    Write benchmark results to a JSON file.
+
+    Args:
+        results (dict): The results from ``heputils.benchmark.run``
+        path (str): The output path
+    """
+    with open(path, "w") as results_file:
+        json.dump(results, results_file, indent=2)
+
+
+def load(path):
+    """
+    Read benchmark results from a JSON file.
+
+    Args:
+        path (str): The path of the results file
+
+    Returns:
+        dict: The benchmark results
+    """
+    with open(path) as results_file:
+        return json.load(results_file)
@@ -1,3 +1,4 @@
+import contextlib
 import logging
 
 import click
@@ -12,3 +13,131 @@ log = logging.getLogger(__name__)
 @click.version_option(version=__version__)
 def heputils():
     pass
+
+
+@heputils.command()
+@click.argument("inputs", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option(
+    "-c",
+    "--config",
+    required=True,
+    type=click.Path(exists=True),
+    help="JSON file of plot specifications.",
+)
+@click.option(
+    "-o", "--output-dir", default="plots", show_default=True, help="Output directory."
+)
+@click.option(
+    "-f",
+    "--format",
+    "formats",
+    multiple=True,
+    default=["pdf"],
+    show_default=True,
+    help="Output file format. Can be given multiple times.",
+)
+@click.option(
+    "--interval",
+    default=1.0,
+    show_default=True,
+    help="Time in seconds between polls of the input files.",
+)
+@click.option("--style", default="ATLAS", show_default=True, help="Plotting style.")
+def watch(inputs, config, output_dir, formats, interval, style):
+    """
+    Watch input ROOT files and re-render the plots affected by changes.
+    """
+    # Imported here to keep the CLI startup fast
+    from heputils import batch
+    from heputils import plot
+    from heputils.watch import HistogramWatcher
+
+    logging.getLogger("heputils").setLevel(logging.INFO)
+    plot.set_style(style)
+    watcher = HistogramWatcher(
+        inputs, batch.load_specs(config), output_dir, formats=formats
+    )
+    log.info(f"Watching {len(inputs)} files. Press Ctrl+C to stop.")
+    try:
+        watcher.run(interval=interval)
+    except KeyboardInterrupt:
+        pass
+
+
+@heputils.command()
+@click.option(
+    "-o",
+    "--output",
+    default="benchmark.json",
+    show_default=True,
+    help="JSON file to write the results to.",
+)
+@click.option(
+    "-k",
+    "--benchmark",
+    "names",
+    multiple=True,
+    help="Benchmark to run. Can be given multiple times. Defaults to all.",
+)
+@click.option(
+    "--repeat",
+    default=5,
+    show_default=True,
+    help="Number of timed runs of each benchmark.",
+)
+@click.option(
+    "--bins", default=1000, show_default=True, help="Number of histogram bins."
+)
+@click.option(
+    "--samples", default=20, show_default=True, help="Number of stacked samples."
+)
+@click.option(
+    "--compare",
+    type=click.Path(exists=True),
+    help="JSON file of baseline results to compare against.",
+)
+@click.option(
+    "--trace",
+    "trace_path",
+    type=click.Path(),
+    help="Chrome trace JSON file to write the timings of the plot phases to.",
+)
+@click.option("--style", default="ATLAS", show_default=True, help="Plotting style.")
+def bench(output, names, repeat, bins, samples, compare, trace_path, style):
+    """
+    Benchmark the plotting, conversion, and histogram utilities.
+    """
+    # Imported here to keep the CLI startup fast
+    import matplotlib
+
+    matplotlib.use("agg")
+    from heputils import benchmark
+    from heputils import trace
+
+    # Only profile on request as the timers add overhead to the benchmarks
+    profiling = trace.profile() if trace_path else contextlib.nullcontext()
+    try:
+        with profiling as profile:
+            results = benchmark.run(
+                names=list(names) or None,
+                repeat=repeat,
+                n_bins=bins,
+                n_samples=samples,
+                style=style,
+            )
+    except ValueError as err:
+        raise click.BadParameter(str(err), param_hint="--benchmark")
+    if trace_path:
+        profile.save(trace_path)
+        results["phases"] = profile.stats()
+    benchmark.save(results, output)
+
+    ratios = benchmark.compare(benchmark.load(compare), results) if compare else {}
+    for name, result in results["results"].items():
+        line = (
+            f"{name:<24} {result['median'] * 1e3:10.2f} ms"
+            + f" {result['peak_memory'] / 2 ** 20:10.2f} MiB"
+        )
+        if name in ratios:
+            line += f" {ratios[name]['median']:8.2f}x"
+        click.echo(line)
@@ -1,8 +1,16 @@
 """Convert between different histogram representations"""
 
 import hist
+import numpy as np
 from hist import Hist
 
+# Storages with a bin value and optionally a bin variance, which map onto the
+# values and variances columns of an Arrow table
+_arrow_storages = ("Double", "Int64", "AtomicInt64", "Unlimited", "Weight")
+
+# Lists longer than this need 64-bit offsets
+_max_list_offset = 2**31 - 1
+
 
 def uproot_to_hist(uproot_hist):
     """
@@ -62,3 +70,359 @@ def numpy_to_hist(values, edges, name=None):
     )
     _hist[:] = values
     return _hist
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as err:
+        raise ImportError(
+            "Converting histograms to Arrow requires pyarrow. "
+            + "Install it with: python -m pip install heputils[arrow]"
+        ) from err
+    return pyarrow
+
+
+def _list_array(arrays, value_type):
+    """
+    Build an Arrow list array with a row for each array without creating a
+    Python object for each element.
+
+    Rows that are ``None`` are null. If all rows are the same length and none
+    are null a fixed-size list array is built instead.
+    """
+    pa = _import_pyarrow()
+    lengths = np.array([0 if array is None else len(array) for array in arrays])
+    present = [array for array in arrays if array is not None]
+    flat = np.concatenate(present) if present else np.empty(0)
+    values = pa.array(flat, type=value_type)
+
+    if len(present) == len(arrays) and lengths.size and np.all(lengths == lengths[0]):
+        return pa.FixedSizeListArray.from_arrays(values, int(lengths[0]))
+
+    offsets = np.zeros(lengths.size + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    large = offsets[-1] > _max_list_offset
+    # A null offset makes its row null, which is safe as null rows are empty
+    offsets = pa.array(
+        offsets,
+        type=pa.int64() if large else pa.int32(),
+        mask=np.append([array is None for array in arrays], False),
+    )
+    if large:
+        return pa.LargeListArray.from_arrays(offsets, values)
+    return pa.ListArray.from_arrays(offsets, values)
+
+
+def _list_views(column):
+    """
+    Zero-copy `numpy` views of each row of an Arrow list column, or ``None``
+    for null rows.
+    """
+    pa = _import_pyarrow()
+    views = []
+    for chunk in column.chunks:
+        valid = chunk.is_valid().to_numpy(zero_copy_only=False)
+        if isinstance(chunk, pa.FixedSizeListArray):
+            size = chunk.type.list_size
+            flat = chunk.values.to_numpy(zero_copy_only=True)
+            offsets = (np.arange(len(chunk) + 1) + chunk.offset) * size
+        else:
+            # The offsets index into the unsliced values of the chunk
+            flat = chunk.values.to_numpy(zero_copy_only=True)
+            offsets = chunk.offsets.to_numpy(zero_copy_only=True)
+        views.extend(
+            flat[start:stop] if is_valid else None
+            for start, stop, is_valid in zip(offsets[:-1], offsets[1:], valid)
+        )
+    return views
+
+
+def _axis_type(axis):
+    if isinstance(axis, hist.axis.Boolean):
+        return "boolean"
+    if isinstance(axis, hist.axis.StrCategory):
+        return "str_category"
+    if isinstance(axis, hist.axis.IntCategory):
+        return "int_category"
+    if isinstance(axis, hist.axis.Integer):
+        return "integer"
+    if isinstance(axis, hist.axis.Regular) and axis.transform is None:
+        return "regular"
+    # Transformed regular axes keep their edges but not the transform
+    return "variable"
+
+
+def _axis_from_metadata(metadata):
+    axis_type = metadata["type"]
+    kwargs = {"name": metadata["name"], "label": metadata["label"]}
+    if axis_type == "boolean":
+        return hist.axis.Boolean(**kwargs)
+
+    kwargs.update(growth=metadata["growth"], overflow=metadata["overflow"])
+    if axis_type == "str_category":
+        return hist.axis.StrCategory(metadata["categories"], **kwargs)
+    if axis_type == "int_category":
+        categories = [int(category) for category in metadata["categories"]]
+        return hist.axis.IntCategory(categories, **kwargs)
+
+    kwargs.update(underflow=metadata["underflow"], circular=metadata["circular"])
+    edges = metadata["edges"]
+    if axis_type == "integer":
+        return hist.axis.Integer(int(edges[0]), int(edges[-1]), **kwargs)
+    if axis_type == "regular":
+        return hist.axis.Regular(len(edges) - 1, edges[0], edges[-1], **kwargs)
+    return hist.axis.Variable(edges, **kwargs)
+
+
+def _axes_array(hists):
+    """
+    Build the list of axis metadata structs of each histogram.
+    """
+    pa = _import_pyarrow()
+    axes = [axis for _hist in hists for axis in _hist.axes]
+    types = [_axis_type(axis) for axis in axes]
+    categorical = [axis_type.endswith("category") for axis_type in types]
+    fields = {
+        "type": pa.array(types, type=pa.string()),
+        "name": pa.array([axis.name for axis in axes], type=pa.string()),
+        # Axis labels fall back to the name when they are not set
+        "label": pa.array(
+            ["" if axis.label == axis.name else axis.label for axis in axes],
+            type=pa.string(),
+        ),
+        "edges": _list_array(
+            [
+                np.empty(0) if is_categorical else axis.edges
+                for axis, is_categorical in zip(axes, categorical)
+            ],
+            pa.float64(),
+        ),
+        "categories": pa.array(
+            [
+                [str(category) for category in axis] if is_categorical else []
+                for axis, is_categorical in zip(axes, categorical)
+            ],
+            type=pa.list_(pa.string()),
+        ),
+    }
+    for trait in ("underflow", "overflow", "growth", "circular"):
+        fields[trait] = pa.array(
+            [getattr(axis.traits, trait) for axis in axes], type=pa.bool_()
+        )
+    structs = pa.StructArray.from_arrays(list(fields.values()), names=list(fields))
+
+    offsets = np.zeros(len(hists) + 1, dtype=np.int32)
+    np.cumsum([_hist.ndim for _hist in hists], out=offsets[1:])
+    return pa.ListArray.from_arrays(pa.array(offsets), structs)
+
+
+def to_arrow(hists):
+    """
+    Convert a collection of `hist` histograms to an Arrow table with a row for
+    each histogram.
+
+    The table has ``name``, ``label``, and ``storage`` columns, an ``axes``
+    column with the metadata of each axis, and ``values`` and ``variances``
+    list columns with the flattened bin contents including the flow bins.
+    When all histograms have the same number of bins the bin contents are
+    fixed-size lists. The ``variances`` of storages that do not track variances
+    are null. The bin contents are copied once into the Arrow buffers without
+    creating Python objects for the bins.
+
+    Regular axes with a transform are stored as variable axes with the same
+    edges.
+
+    Example:
+
+        >>> import hist
+        >>> import heputils
+        >>> _hist = hist.Hist(hist.axis.Regular(4, 0, 4, name="mass")).fill([0, 1, 1, 3])
+        >>> table = heputils.convert.to_arrow({"jet_mass": _hist})
+        >>> table.column_names
+        ['name', 'label', 'storage', 'axes', 'values', 'variances']
+        >>> table.num_rows
+        1
+
+    Args:
+        hists (dict): The `hist.Hist` objects keyed by name
+
+    Returns:
+        `pyarrow.Table`: The table of histograms
+    """
+    pa = _import_pyarrow()
+    names = list(hists)
+    hists = list(hists.values())
+
+    storages = [_hist.storage_type.__name__ for _hist in hists]
+    unsupported = sorted(set(storages) - set(_arrow_storages))
+    if unsupported:
+        raise ValueError(
+            f"Storages {unsupported} can not be converted to Arrow. "
+            + f"Expected any of {list(_arrow_storages)}."
+        )
+
+    values = []
+    variances = []
+    for _hist in hists:
+        view = _hist.view(flow=True)
+        if view.dtype.names:
+            values.append(view["value"].ravel())
+            variances.append(view["variance"].ravel())
+        else:
+            values.append(view.ravel())
+            variances.append(None)
+
+    return pa.table(
+        {
+            "name": pa.array(names, type=pa.string()),
+            "label": pa.array([_hist.label for _hist in hists], type=pa.string()),
+            "storage": pa.array(storages, type=pa.string()),
+            "axes": _axes_array(hists),
+            "values": _list_array(values, pa.float64()),
+            "variances": _list_array(variances, pa.float64()),
+        }
+    )
+
+
+def _arrow_rows(table):
+    """
+    The name, axes, and zero-copy flow bin values and variances of each row of
+    an Arrow table of histograms.
+    """
+    names = table.column("name").to_pylist()
+    axes = table.column("axes").to_pylist()
+    values = _list_views(table.column("values"))
+    variances = _list_views(table.column("variances"))
+
+    for name, _axes, _values, _variances in zip(names, axes, values, variances):
+        _axes = [_axis_from_metadata(metadata) for metadata in _axes]
+        shape = tuple(axis.extent for axis in _axes)
+        if _variances is not None:
+            _variances = _variances.reshape(shape)
+        yield name, _axes, _values.reshape(shape), _variances
+
+
+def arrow_views(table, flow=False):
+    """
+    Read the bin contents of an Arrow table of histograms from
+    ``heputils.convert.to_arrow`` without copying them.
+
+    The views are read-only and share memory with the table, so they are only
+    valid while the table is alive.
+
+    Example:
+
+        >>> import hist
+        >>> import heputils
+        >>> _hist = hist.Hist(hist.axis.Regular(4, 0, 4)).fill([0, 1, 1, 3])
+        >>> table = heputils.convert.to_arrow({"jet_mass": _hist})
+        >>> values, variances = heputils.convert.arrow_views(table)["jet_mass"]
+        >>> values.tolist(), variances
+        ([1.0, 2.0, 0.0, 1.0], None)
+
+    Args:
+        table (`pyarrow.Table`): The table of histograms
+        flow (bool): If ``True`` include the flow bins
+
+    Returns:
+        dict: The bin values and variances, or ``None`` if the storage does not
+        track variances, keyed by histogram name
+    """
+    views = {}
+    for name, axes, values, variances in _arrow_rows(table):
+        if not flow:
+            selection = tuple(
+                slice(axis.traits.underflow, axis.traits.underflow + axis.size)
+                for axis in axes
+            )
+            values = values[selection]
+            variances = None if variances is None else variances[selection]
+        views[name] = (values, variances)
+    return views
+
+
+def from_arrow(table):
+    """
+    Convert an Arrow table of histograms from ``heputils.convert.to_arrow``
+    back to `hist` histograms.
+
+    `hist.Hist` objects own their storage, so the bin contents are copied. Use
+    ``heputils.convert.arrow_views`` to read them without copying.
+
+    Example:
+
+        >>> import hist
+        >>> import heputils
+        >>> _hist = hist.Hist(hist.axis.Regular(4, 0, 4)).fill([0, 1, 1, 3])
+        >>> table = heputils.convert.to_arrow({"jet_mass": _hist})
+        >>> heputils.convert.from_arrow(table)["jet_mass"] == _hist
+        True
+
+    Args:
+        table (`pyarrow.Table`): The table of histograms
+
+    Returns:
+        dict: The `hist.Hist` objects keyed by name
+    """
+    labels = table.column("label").to_pylist()
+    storages = table.column("storage").to_pylist()
+
+    hists = {}
+    for (name, axes, values, variances), label, storage in zip(
+        _arrow_rows(table), labels, storages
+    ):
+        _hist = Hist(
+            *axes, storage=getattr(hist.storage, storage)(), name=name, label=label
+        )
+        view = _hist.view(flow=True)
+        if view.dtype.names:
+            view["value"] = values
+            view["variance"] = variances
+        else:
+            view[...] = values
+        hists[name] = _hist
+    return hists
+
+
+def write_parquet(hists, path, **kwargs):
+    """
+    Write a collection of `hist` histograms to a Parquet file.
+
+    Example:
+
+        >>> import heputils
+        >>> heputils.convert.write_parquet(hists, "hists.parquet")  # doctest: +SKIP
+
+    Args:
+        hists (dict): The `hist.Hist` objects keyed by name
+        path (str): The output path
+        kwargs: Keyword arguments passed to ``pyarrow.parquet.write_table``,
+            such as ``compression``
+    """
+    _import_pyarrow()
+    import pyarrow.parquet as pq
+
+    pq.write_table(to_arrow(hists), path, **kwargs)
+
+
+def read_parquet(path):
+    """
+    Read a collection of `hist` histograms from a Parquet file written by
+    ``heputils.convert.write_parquet``.
+
+    Example:
+
+        >>> import heputils
+        >>> hists = heputils.convert.read_parquet("hists.parquet")  # doctest: +SKIP
+
+    Args:
+        path (str): The path of the Parquet file
+
+    Returns:
+        dict: The `hist.Hist` objects keyed by name
+    """
+    _import_pyarrow()
+    import pyarrow.parquet as pq
+
+    return from_arrow(pq.read_table(path))
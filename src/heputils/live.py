@@ -0,0 +1,321 @@
+"""Fill histograms from streams of events and re-plot them as they grow."""
+
+import threading
+import time
+
+import awkward as ak
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.container import BarContainer
+from matplotlib.container import ErrorbarContainer
+from matplotlib.patches import StepPatch
+
+from heputils import output
+from heputils import plot
+
+
+def _to_numpy(array):
+    """
+    Convert a chunk of events to a flat `numpy` array.
+
+    Awkward arrays are flattened so that jagged quantities, such as the
+    transverse momenta of all jets in the events, are filled per object.
+    """
+    if isinstance(array, ak.Array):
+        return ak.to_numpy(ak.flatten(array, axis=None))
+    return np.asarray(array)
+
+
+class LiveHist:
+    """
+    Accumulate a histogram from chunks of events filled from producer threads.
+
+    Chunks are filled into a back buffer that only producers touch. The back
+    buffer is copied to a front buffer, which is then published as the current
+    snapshot by replacing the reference to it, at most every
+    ``publish_interval`` seconds. Readers such as the plotting thread never
+    wait for fills and always see a complete snapshot, which is never modified
+    after it is published. Call ``flush`` at the end of the stream to publish
+    the last chunks.
+
+    Example:
+
+        >>> import hist
+        >>> import numpy as np
+        >>> import heputils
+        >>> live_hist = heputils.live.LiveHist(hist.Hist(hist.axis.Regular(4, 0, 4)))
+        >>> for chunk in np.array_split(np.array([0.5, 1.5, 1.5, 3.5]), 2):
+        ...     live_hist.fill(chunk)
+        >>> live_hist.flush()
+        >>> live_hist.snapshot().values().tolist()
+        [1.0, 2.0, 0.0, 1.0]
+
+    Args:
+        hist (`hist.Hist`): The histogram to fill into, which is copied
+        publish_interval (float): The minimum time in seconds between
+            published snapshots
+    """
+
+    def __init__(self, hist, publish_interval=0.1):
+        self.publish_interval = publish_interval
+        self.version = 0
+        self.n_chunks = 0
+        self.n_entries = 0
+        self._back = hist.copy()
+        self._front = hist.copy()
+        self._fill_lock = threading.Lock()
+        self._last_publish = time.monotonic()
+
+    def fill(self, *args, weight=None, **kwargs):
+        """
+        Fill a chunk of events, which are `numpy` or `awkward` arrays.
+
+        Args:
+            args: The values to fill for each axis
+            weight (`array`): The weights of the events
+            kwargs: Keyword arguments to ``hist.Hist.fill``
+        """
+        args = [_to_numpy(arg) for arg in args]
+        if weight is not None:
+            weight = _to_numpy(weight)
+        with self._fill_lock:
+            self._back.fill(*args, weight=weight, **kwargs)
+            self.n_chunks += 1
+            self.n_entries += len(args[0]) if args else 0
+            if time.monotonic() - self._last_publish >= self.publish_interval:
+                self._publish()
+
+    def _publish(self):
+        # Copy the storage but share the immutable axes with the back buffer
+        self._front = self._back.copy(deep=False)
+        self.version += 1
+        self._last_publish = time.monotonic()
+
+    def flush(self):
+        """
+        Publish all chunks filled so far.
+        """
+        with self._fill_lock:
+            self._publish()
+
+    def snapshot(self):
+        """
+        The most recently published snapshot of the histogram.
+
+        Returns:
+            `hist.Hist`: The histogram, which must not be modified
+        """
+        return self._front
+
+
+class LivePlot:
+    """
+    Re-plot live histograms as a stack or as data at a throttled rate.
+
+    The plot is drawn once with ``heputils.plot.stack_hist``, or with
+    ``heputils.plot.data_hist`` if there are no stacked histograms. Later
+    updates set the new bin contents on the existing stack, uncertainty band,
+    and data artists and rescale the y-axis, rather than clearing and drawing
+    the axis again. The plot is fully redrawn if the histograms were empty
+    when last drawn, or if it was drawn with ``decimate``, ``density``,
+    ``syst_variations``, or ``data_uncert``.
+
+    Example:
+
+        >>> import threading
+        >>> import heputils
+        >>> live_plot = heputils.live.LivePlot(
+        ...     [live_ttbar, live_wjets], data_hist=live_data, interval=2.0
+        ... )  # doctest: +SKIP
+        >>> stop = threading.Event()  # doctest: +SKIP
+        >>> threading.Thread(target=produce, args=(stop,)).start()  # doctest: +SKIP
+        >>> live_plot.run(stop)  # doctest: +SKIP
+
+    Args:
+        hists (`list` of `heputils.live.LiveHist`): The histograms to stack
+        data_hist (`heputils.live.LiveHist`): The data histogram
+        ax (`matplotlib.axes.Axes`): The axis object to plot on
+        interval (float): The minimum time in seconds between updates
+        output (`str` or `dict`): The output path, or a dict of keyword
+            arguments to ``heputils.output.save_figure``, to save the figure to
+            after each update
+        kwargs: Keyword arguments to ``heputils.plot.stack_hist`` or
+            ``heputils.plot.data_hist``
+    """
+
+    def __init__(
+        self, hists=None, data_hist=None, ax=None, interval=2.0, output=None, **kwargs
+    ):
+        self.hists = list(hists) if hists is not None else []
+        self.data_hist = data_hist
+        if not self.hists and data_hist is None:
+            raise ValueError(
+                "LivePlot requires stacked histograms or a data histogram."
+            )
+        self.ax = plt.gca() if ax is None else ax
+        self.interval = interval
+        self.output = output
+        self.kwargs = kwargs
+        self.n_updates = 0
+        # Plots whose drawn contents are not just the live bin contents
+        self._in_place = not any(
+            kwargs.get(key) is not None and kwargs.get(key) is not False
+            for key in ("decimate", "density", "syst_variations", "data_uncert")
+        )
+        self._artists = None
+        self._versions = None
+        self._last_update = None
+
+    def _live_hists(self):
+        return self.hists + ([self.data_hist] if self.data_hist is not None else [])
+
+    def _redraw(self, hists, data_hist):
+        ax = self.ax
+        ax.cla()
+        if hists:
+            plot.stack_hist(hists, data_hist=data_hist, ax=ax, **self.kwargs)
+        else:
+            plot.data_hist(data_hist, ax=ax, **self.kwargs)
+
+        self._artists = None
+        if not self._in_place:
+            return
+        # mplhep draws the stack from the top down
+        steps = [patch for patch in ax.patches if isinstance(patch, StepPatch)][::-1]
+        band = [c for c in ax.containers if isinstance(c, BarContainer)]
+        errorbar = [c for c in ax.containers if isinstance(c, ErrorbarContainer)]
+        if (
+            len(steps) != len(hists)
+            or len(band) != (1 if hists else 0)
+            or len(errorbar) != (0 if data_hist is None else 1)
+        ):
+            return
+        max_height = self._max_height(hists, data_hist)
+        if max_height > 0:
+            self._artists = (steps, band, errorbar, max_height)
+
+    def _max_height(self, hists, data_hist, stack=None):
+        max_height = 0.0
+        if hists:
+            if stack is None:
+                stack, _ = self._stack(hists)
+            max_height = stack[-1].max()
+        if data_hist is not None:
+            max_height = max(max_height, data_hist.values().max())
+        return max_height
+
+    def _stack(self, hists):
+        """
+        The cumulative bin values of the scaled stack and its total variances.
+        """
+        values = np.array([_hist.values() for _hist in hists], dtype=float)
+        variances = np.array([_hist.variances() for _hist in hists], dtype=float)
+        scale_factors = self.kwargs.get("scale_factors")
+        if scale_factors is not None:
+            scale_factors = np.asarray(scale_factors, dtype=float)[:, None]
+            values *= scale_factors
+            variances *= scale_factors**2
+        return np.cumsum(values, axis=0), variances.sum(axis=0)
+
+    def _update_artists(self, hists, data_hist):
+        steps, band, errorbar, max_height = self._artists
+        ax = self.ax
+
+        stack = None
+        if hists:
+            stack, variances = self._stack(hists)
+            baseline = np.zeros(stack.shape[1])
+            for step, top in zip(steps, stack):
+                step.set_data(values=top, baseline=baseline)
+                baseline = top
+
+            # Match the statistical uncertainty band of plot._plot_uncertainty
+            stat_uncert = np.sqrt(variances)
+            bar_bottom = np.maximum(stack[-1] - stat_uncert, 0)
+            for bar, bottom, height in zip(band[0], bar_bottom, 2 * stat_uncert):
+                bar.set_y(bottom)
+                bar.set_height(height)
+
+        if data_hist is not None:
+            data_line, _, (bar_lines,) = errorbar[0].lines
+            values = data_hist.values()
+            uncert = np.sqrt(values)
+            data_line.set_ydata(values)
+            segments = np.empty((values.size, 2, 2))
+            segments[:, :, 0] = data_line.get_xdata()[:, None]
+            segments[:, 0, 1] = values - uncert
+            segments[:, 1, 1] = values + uncert
+            bar_lines.set_segments(segments)
+
+        # Keep the headroom made for the legend and experiment label
+        new_max_height = self._max_height(hists, data_hist, stack=stack)
+        if new_max_height > 0:
+            bottom, top = ax.get_ylim()
+            ax.set_ylim(bottom, top * new_max_height / max_height)
+            self._artists = (steps, band, errorbar, new_max_height)
+
+    def update(self, force=False):
+        """
+        Update the plot if ``interval`` seconds have passed since the last update
+        and any of the histograms changed.
+
+        Args:
+            force (bool): If ``True`` update regardless of the time and changes
+
+        Returns:
+            bool: If the plot was updated
+        """
+        now = time.monotonic()
+        if not force and self._last_update is not None:
+            if now - self._last_update < self.interval:
+                return False
+        # Read the versions before the snapshots so no change is missed
+        versions = [live_hist.version for live_hist in self._live_hists()]
+        if not force and versions == self._versions:
+            return False
+
+        hists = [live_hist.snapshot() for live_hist in self.hists]
+        data_hist = None if self.data_hist is None else self.data_hist.snapshot()
+        if self._artists is None:
+            self._redraw(hists, data_hist)
+        else:
+            self._update_artists(hists, data_hist)
+
+        self._versions = versions
+        self._last_update = now
+        self.n_updates += 1
+        fig = self.ax.figure
+        fig.canvas.draw_idle()
+        if self.output is not None:
+            output_kwargs = (
+                {"path": self.output}
+                if isinstance(self.output, str)
+                else dict(self.output)
+            )
+            output.save_figure(fig, **output_kwargs)
+        return True
+
+    def run(self, stop=None, max_updates=None):
+        """
+        Update the plot every ``interval`` seconds until stopped.
+
+        Once stopped the histograms are flushed and the plot is updated a last
+        time.
+
+        Args:
+            stop (`threading.Event`): The event signaling the end of the stream.
+                If ``None`` run until ``max_updates`` or until interrupted.
+            max_updates (int): The number of updates after which to stop. If
+                ``None`` run until ``stop`` is set.
+        """
+        stop = threading.Event() if stop is None else stop
+        while not stop.is_set():
+            if max_updates is not None and self.n_updates >= max_updates:
+                return
+            self.update()
+            self.ax.figure.canvas.flush_events()
+            stop.wait(self.interval)
+
+        for live_hist in self._live_hists():
+            live_hist.flush()
+        self.update(force=True)
@@ -0,0 +1,436 @@
+"""Write figures to file."""
+
+import contextlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from heputils import trace
+
+
+def close_figure(fig):
+    """
+    Release a figure and its resources.
+
+    Figures managed by ``pyplot`` are removed from the figure manager, and
+    all figures are cleared so that their artists can be garbage collected.
+
+    Args:
+        fig (`matplotlib.figure.Figure`): The figure to close
+    """
+    plt.close(fig)
+    fig.clear()
+
+
+@contextlib.contextmanager
+def _agg_renderer(fig, dpi):
+    """
+    Measure the figure with the Agg renderer at the resolution ``dpi``, as
+    ``savefig`` does for PNG output.
+
+    Yields:
+        `matplotlib.backends.backend_agg.RendererAgg`: The renderer
+    """
+    original_canvas, original_dpi = fig.canvas, fig.dpi
+    try:
+        fig.dpi = dpi
+        yield FigureCanvasAgg(fig).get_renderer()
+    finally:
+        fig.dpi = original_dpi
+        fig.set_canvas(original_canvas)
+
+
+@contextlib.contextmanager
+def _frozen_layout(fig, dpi):
+    """
+    Lay out the figure once and keep the layout fixed for all following draws.
+
+    The figure is drawn without rendering once to run its layout engine and to
+    find the tight bounding box if ``savefig.bbox`` is ``"tight"``. The layout
+    engine is then disabled, and the bounding box is passed explicitly to each
+    ``savefig`` call, so saving does not lay out the figure again per format.
+    The figure is measured with the Agg renderer at the highest PNG resolution,
+    so vector formats may differ from a separate ``savefig`` call by a fraction
+    of a point.
+
+    Args:
+        fig (`matplotlib.figure.Figure`): The figure to lay out
+        dpi (float): The resolution the figure is measured at
+
+    Yields:
+        dict: The keyword arguments to pass to ``savefig``
+    """
+    get_layout_engine = getattr(fig, "get_layout_engine", None)
+    layout_engine = get_layout_engine() if get_layout_engine is not None else None
+    tight = plt.rcParams["savefig.bbox"] == "tight"
+    pad_inches = plt.rcParams["savefig.pad_inches"]
+    if layout_engine is None and not tight:
+        yield {}
+        return
+
+    savefig_kwargs = {}
+    with trace.phase("layout"), _agg_renderer(fig, dpi) as renderer:
+        # Lay out with the renderer used for PNG output, as savefig does,
+        # rather than with the renderer of the default savefig format
+        with getattr(renderer, "_draw_disabled", contextlib.nullcontext)():
+            fig.draw(renderer)
+        if tight and isinstance(pad_inches, (int, float)):
+            bbox_inches = fig.get_tightbbox(renderer).padded(pad_inches)
+            savefig_kwargs["bbox_inches"] = bbox_inches
+    if layout_engine is None:
+        yield savefig_kwargs
+        return
+
+    fig.set_layout_engine("none")
+    try:
+        yield savefig_kwargs
+    finally:
+        fig.set_layout_engine(layout_engine)
+
+
+class _RasterCanvas(FigureCanvasAgg):
+    """
+    An Agg canvas that keeps the image drawn by ``savefig`` in memory.
+
+    Drawing through ``savefig`` applies the ``savefig`` settings, such as the
+    bounding box, padding, and face color, the same way as for other formats.
+    """
+
+    def print_raster(self, filename_or_obj, **kwargs):
+        FigureCanvasAgg.draw(self)
+        self.raster = np.array(self.get_renderer().buffer_rgba())
+
+
+@trace.traced("savefig")
+def _agg_raster(fig, dpi, **savefig_kwargs):
+    """
+    Draw the figure once with the Agg renderer as ``savefig`` would.
+
+    Args:
+        fig (`matplotlib.figure.Figure`): The figure to draw
+        dpi (float): The resolution to draw at
+        savefig_kwargs: Keyword arguments to ``savefig``
+
+    Returns:
+        `numpy.ndarray`: The RGBA image of the figure
+    """
+    # Swap in the canvas the same way savefig does for other formats
+    original_canvas = fig.canvas
+    try:
+        canvas = _RasterCanvas(fig)
+        fig.savefig(None, format="raster", dpi=dpi, **savefig_kwargs)
+        return canvas.raster
+    finally:
+        fig.set_canvas(original_canvas)
+
+
+def _output_paths(path, formats):
+    stem, suffix = os.path.splitext(path)
+    if formats is None:
+        formats = (suffix[1:],) if suffix else ("pdf",)
+    elif isinstance(formats, str):
+        formats = (formats,)
+    if suffix[1:] not in formats:
+        # Not a file extension, e.g. a dot in the file name
+        stem = path
+    return stem, [file_format.lower() for file_format in formats]
+
+
+def _write_bytes(path, data):
+    with open(path, "wb") as output_file:
+        output_file.write(data)
+
+
+def _write_png(path, raster, dpi, max_dpi):
+    # Imported here to keep the import of heputils fast
+    from PIL import Image
+
+    image = Image.fromarray(raster)
+    if dpi != max_dpi:
+        scale = dpi / max_dpi
+        size = (round(image.width * scale), round(image.height * scale))
+        image = image.resize(size, Image.LANCZOS)
+    image.save(path, format="png", dpi=(dpi, dpi))
+
+
+def _render_outputs(fig, path, formats, dpi):
+    """
+    Draw a figure into memory for each output file.
+
+    All drawing happens here, so the figure can be changed or closed once this
+    returns. Image compression and file writes are left to the returned tasks.
+
+    Returns:
+        tuple: The output directory and a list of the output paths and the
+        tasks that write them
+    """
+    stem, formats = _output_paths(path, formats)
+    if dpi is None:
+        dpi = plt.rcParams["savefig.dpi"]
+        dpi = fig.dpi if dpi == "figure" else dpi
+    dpis = sorted(set(dpi)) if isinstance(dpi, (list, tuple)) else [dpi]
+
+    outputs = []
+    with _frozen_layout(fig, dpis[-1]) as savefig_kwargs:
+        for file_format in formats:
+            if file_format != "png":
+                buffer = io.BytesIO()
+                with trace.phase("savefig"):
+                    fig.savefig(
+                        buffer, format=file_format, dpi=dpis[-1], **savefig_kwargs
+                    )
+                file_path = f"{stem}.{file_format}"
+                outputs.append((file_path, (_write_bytes, buffer.getvalue())))
+                continue
+
+            raster = _agg_raster(fig, dpis[-1], **savefig_kwargs)
+            for _dpi in dpis:
+                file_path = (
+                    f"{stem}.png" if len(dpis) == 1 else f"{stem}_{_dpi:g}dpi.png"
+                )
+                outputs.append((file_path, (_write_png, raster, _dpi, dpis[-1])))
+    return os.path.dirname(stem), outputs
+
+
+def _write_outputs(output_dir, outputs):
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    for file_path, (write, *args) in outputs:
+        with trace.phase("write"):
+            write(file_path, *args)
+    return [file_path for file_path, _ in outputs]
+
+
+def save_figure(fig, path, formats=None, dpi=None):
+    """
+    Save a figure to multiple file formats from a single layout.
+
+    The figure is laid out once, including its tight bounding box if
+    ``savefig.bbox`` is ``"tight"``, and the layout is reused for all formats.
+    Each format is then drawn once, and all PNG resolutions are produced from a
+    single Agg raster drawn at the highest requested resolution. The
+    ``savefig`` settings of the style apply to all formats alike. The figure is
+    saved through its ``Figure`` methods, so it does not need to be managed by
+    ``pyplot``.
+
+    Example:
+
+        >>> import heputils
+        >>> heputils.output.save_figure(
+        ...     fig, "plots/jet_mass", formats=["pdf", "png", "svg"], dpi=[100, 300]
+        ... )  # doctest: +SKIP
+        ['plots/jet_mass.pdf', 'plots/jet_mass_100dpi.png', 'plots/jet_mass_300dpi.png', 'plots/jet_mass.svg']
+
+    Args:
+        fig (`matplotlib.figure.Figure`): The figure to save
+        path (str): The output path. If ``formats`` is not given the file
+            extension of the path is used as the format, with a default of PDF.
+        formats (`list` of `str`): The file formats to save
+        dpi (`float` or `list` of `float`): The resolution of raster formats.
+            If a list of resolutions is given a PNG is saved for each of them.
+            Defaults to ``rcParams["savefig.dpi"]``.
+
+    Returns:
+        list: The paths of the saved files
+    """
+    return _write_outputs(*_render_outputs(fig, path, formats, dpi))
+
+
+class AsyncSaver:
+    """
+    Save figures in the background so rendering overlaps with disk I/O.
+
+    Each figure is drawn into memory on the calling thread, as matplotlib
+    figures are not thread safe, after which the figure may be changed or
+    closed. PNG compression and all file writes then happen in a pool of
+    threads. Vector formats are compressed while they are drawn, so only their
+    writes are moved off the calling thread. At most ``max_pending`` figures
+    are held in memory waiting to be written, after which ``save`` blocks.
+
+    Errors raised while writing are raised again by the next call to ``save``,
+    ``wait``, or ``close``, or by the ``result`` of the returned future.
+
+    Example:
+
+        >>> import heputils
+        >>> with heputils.output.AsyncSaver() as saver:  # doctest: +SKIP
+        ...     for name, _hists in regions.items():
+        ...         ax = heputils.plot.stack_hist(
+        ...             _hists, output={"path": f"{name}.png", "saver": saver}
+        ...         )
+
+    Args:
+        max_workers (int): The number of writer threads
+        max_pending (int): The maximum number of figures waiting to be written
+    """
+
+    def __init__(self, max_workers=2, max_pending=8):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="heputils-saver"
+        )
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Don't mask an exception raised within the block
+        self.close(raise_errors=exc_type is None)
+
+    def _raise_errors(self):
+        error = None
+        pending = []
+        for future in self._futures:
+            if not future.done():
+                pending.append(future)
+            elif error is None:
+                error = future.exception()
+        self._futures = pending
+        if error is not None:
+            raise error
+
+    def save(self, fig, path, formats=None, dpi=None):
+        """
+        Draw a figure and queue its files to be written.
+
+        Takes the same arguments as ``heputils.output.save_figure``.
+
+        Returns:
+            `concurrent.futures.Future`: The future of the list of the paths of
+            the saved files
+        """
+        self._raise_errors()
+        self._slots.acquire()
+        try:
+            output_dir, outputs = _render_outputs(fig, path, formats, dpi)
+            future = self._executor.submit(_write_outputs, output_dir, outputs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+        return future
+
+    def wait(self):
+        """
+        Wait for all queued files to be written.
+        """
+        for future in list(self._futures):
+            future.exception()
+        self._raise_errors()
+
+    def close(self, raise_errors=True):
+        """
+        Wait for all queued files to be written and stop the writer threads.
+
+        Args:
+            raise_errors (bool): If ``True`` raise the first error raised while
+                writing
+        """
+        self._executor.shutdown(wait=True)
+        if raise_errors:
+            self._raise_errors()
+        self._futures = []
+
+
+class PdfBook:
+    """
+    Stream figures into a single multipage PDF as they are produced.
+
+    As all pages are written to the same file, fonts and hatch patterns are
+    embedded only once. Each figure is closed after it is written so memory
+    use stays flat no matter how many pages are written.
+
+    Example:
+
+        >>> import matplotlib.pyplot as plt
+        >>> import heputils
+        >>> with heputils.output.PdfBook("book.pdf", index=True) as book:  # doctest: +SKIP
+        ...     for name, _hists in regions.items():
+        ...         ax = heputils.plot.stack_hist(_hists, ax=plt.figure().add_subplot())
+        ...         book.add(ax.figure, title=name)
+
+    Args:
+        path (str): The path of the PDF file to write
+        index (bool): If ``True`` append index pages listing the page number of
+            each titled figure when the book is closed
+        metadata (dict): PDF document metadata passed to
+            ``matplotlib.backends.backend_pdf.PdfPages``
+    """
+
+    _index_entries_per_page = 50
+
+    def __init__(self, path, index=False, metadata=None):
+        self.path = path
+        self.index = index
+        # Imported here to keep the import of heputils fast
+        from matplotlib.backends.backend_pdf import PdfPages
+
+        self._pdf = PdfPages(path, metadata=metadata)
+        self._titles = []
+        self._n_pages = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def n_pages(self):
+        """The number of pages written so far."""
+        return self._n_pages
+
+    def add(self, fig, title=None, close=True):
+        """
+        Write a figure as the next page of the book.
+
+        Args:
+            fig (`matplotlib.figure.Figure`): The figure to write
+            title (str): The title of the page used in the index
+            close (bool): If ``True`` close the figure after writing it
+
+        Returns:
+            int: The page number of the written page
+        """
+        with trace.phase("savefig"):
+            self._pdf.savefig(fig)
+        self._n_pages += 1
+        page_number = self._n_pages
+        if title is not None:
+            self._titles.append((page_number, title))
+        if close:
+            close_figure(fig)
+        return page_number
+
+    def _write_index(self):
+        for start in range(0, len(self._titles), self._index_entries_per_page):
+            end = start + self._index_entries_per_page
+            entries = self._titles[start:end]
+            fig = plt.figure(figsize=(8.27, 11.69))
+            fig.text(0.1, 0.95, "Index", fontsize=16, verticalalignment="top")
+            fig.text(
+                0.1,
+                0.9,
+                "\n".join(f"{page:>6}  {title}" for page, title in entries),
+                fontsize=9,
+                verticalalignment="top",
+            )
+            self.add(fig)
+
+    def close(self):
+        """
+        Write the index pages, if requested, and finalize the PDF file.
+        """
+        if self._pdf is None:
+            return
+        if self.index and self._titles:
+            self._write_index()
+        self._pdf.close()
+        self._pdf = None
@@ -1,13 +1,28 @@
 """Visualization module."""
 
+import contextlib
 import math
+import sys
 
+import matplotlib
 import matplotlib.pyplot as plt
 import mplhep
 import numpy as np
+from hist.axis import IntCategory
+from hist.axis import StrCategory
+from matplotlib import font_manager
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.colors import LogNorm
+from matplotlib.figure import Figure
 from mplhep import histplot
+from mplhep.plot import soft_update_kwargs
 
+from heputils import convert
+from heputils import trace
 from heputils import utils
+from heputils.output import close_figure
+from heputils.output import save_figure
 
 # To be able to reset
 _experiment_label_info_defaults = {
@@ -21,11 +36,48 @@ _experiment_label_info_defaults = {
 global _experiment_label_info
 _experiment_label_info = _experiment_label_info_defaults.copy()
 
+# Validated rcParams of each style alias used so far
+_style_snapshots = {}
+
+_uncertainty_labels = [
+    "Stat Uncertainty",
+    "Syst Uncertainty",
+    "Stat + Syst Uncertainty",
+]
+
+
+def _style_snapshot(style):
+    """
+    The validated rcParams set by a style alias, built once per alias.
+
+    Args:
+        style (str or `mplhep.style` dict): The experiment style
+
+    Returns:
+        dict: The rcParams of the style, or ``None`` if the style is not an alias
+        of an ``mplhep`` style dict
+    """
+    if not isinstance(style, str):
+        return None
+    snapshot = _style_snapshots.get(style)
+    if snapshot is None:
+        style_dict = getattr(mplhep.style, style, None)
+        if not isinstance(style_dict, dict):
+            return None
+        validated = matplotlib.RcParams(style_dict)
+        # Keep a plain dict as RcParams iteration and lookup are slow
+        snapshot = {key: dict.__getitem__(validated, key) for key in style_dict}
+        _style_snapshots[style] = snapshot
+    return snapshot
+
 
 def set_style(style):
     """
     Set the experiment specific plotting style
 
+    The rcParams of a style alias are validated the first time it is used and
+    applied directly afterwards, so switching between styles is cheap.
+
     Example:
 
         >>> import heputils
@@ -36,12 +88,53 @@ def set_style(style):
     Args:
         style (str or `mplhep.style` dict): The experiment style
     """
-    mplhep.style.use(style)
+    snapshot = _style_snapshot(style)
+    if snapshot is None:
+        mplhep.style.use(style)
+    else:
+        # Already validated, so skip the validation of RcParams.update
+        dict.update(plt.rcParams, snapshot)
     set_experiment_info(reset=True)
     if isinstance(style, str):
         set_experiment_info(name=style.lower())
 
 
+@contextlib.contextmanager
+def style_context(style):
+    """
+    Use an experiment specific plotting style within a block.
+
+    The rcParams and experiment information are restored afterwards.
+
+    Example:
+
+        >>> import matplotlib.pyplot as plt
+        >>> import heputils
+        >>> heputils.plot.set_style("ATLAS")
+        >>> with heputils.plot.style_context("CMS"):
+        ...     plt.rcParams["figure.figsize"]
+        ...
+        [10.0, 10.0]
+        >>> plt.rcParams["figure.figsize"]
+        [8.0, 6.0]
+
+    Args:
+        style (str or `mplhep.style` dict): The experiment style
+    """
+    global _experiment_label_info
+    experiment_info = _experiment_label_info.copy()
+    # Copy and restore all rcParams without validating them again, but keep the
+    # backend as plt.rc_context does
+    previous = dict.copy(plt.rcParams)
+    del previous["backend"]
+    try:
+        set_style(style)
+        yield
+    finally:
+        dict.update(plt.rcParams, previous)
+        _experiment_label_info = experiment_info
+
+
 def use(style):
     """
     Alias for ``heputils.plot.set_style`` to match ``mplhep``'s API.
@@ -61,7 +154,10 @@ def use(style):
 
 def get_style(style=None):
     """
-    Set the experiment specific plotting style
+    Get the current or an experiment specific plotting style
+
+    Without a style the current ``matplotlib.pyplot.rcParams`` are returned
+    without copying them.
 
     Example:
 
@@ -78,8 +174,7 @@ def get_style(style=None):
     Returns:
         dict: The style dict requested
     """
-    style = dict(plt.rcParams) if style is None else getattr(mplhep.style, style)
-    return style
+    return plt.rcParams if style is None else getattr(mplhep.style, style)
 
 
 def set_experiment_info(**kwargs):
@@ -143,6 +238,7 @@ def get_experiment_info():
     return _experiment_label_info
 
 
+@trace.traced("legend")
 def _plot_ax_kwargs(ax, **kwargs):
     """
     Apply kwargs to an axis.
@@ -179,15 +275,17 @@ def _plot_ax_kwargs(ax, **kwargs):
     # Ensure uncertainty and data at top of legend
     handles, labels = ax.get_legend_handles_labels()
     # FIXME: Make this user defined and not hardcoded
-    for label in ["Stat Uncertainty", "Data"]:
+    for label in _uncertainty_labels + ["Data"]:
         if label in labels:
             handles.insert(0, handles.pop(labels.index(label)))
             labels.insert(0, labels.pop(labels.index(label)))
-    ax.legend(handles, labels, loc=legend_loc)
+    if handles:
+        ax.legend(handles, labels, loc=legend_loc)
 
     return (ax, ax.get_children()) if return_artists else ax
 
 
+@trace.traced("label_layout")
 def draw_experiment_label(ax, **kwargs):
     """
     Draw label information to the axes.
@@ -271,7 +369,51 @@ def draw_experiment_label(ax, **kwargs):
     return ax
 
 
-def _max_hist_height(hists, density, stacked=False):
+def _save_output(fig, output):
+    """
+    Save a figure to file as requested by the ``output`` kwarg of the plot
+    functions and then close it.
+
+    Args:
+        fig (`matplotlib.figure.Figure`): The figure to save
+        output (`str` or `dict`): The output path, or a dict of keyword arguments
+            to ``heputils.output.save_figure`` with an optional ``close`` key that
+            defaults to ``True`` and an optional ``saver`` key of a
+            ``heputils.output.AsyncSaver`` to write the files in the background
+    """
+    if output is None:
+        return
+    output_kwargs = {"path": output} if isinstance(output, str) else dict(output)
+    close = output_kwargs.pop("close", True)
+    saver = output_kwargs.pop("saver", None)
+    if saver is not None:
+        saver.save(fig, **output_kwargs)
+    else:
+        save_figure(fig, **output_kwargs)
+    if close:
+        close_figure(fig)
+
+
+def _hist_heights(hists, density):
+    """
+    Determine the bin heights of histograms with the same binning in one pass.
+
+    Args:
+        hists (`lst`): List of histograms with the same binning
+        density (`bool`): If the histograms are density histograms
+
+    Returns:
+        `array`: The bin heights with shape ``(histograms, bins)``
+    """
+    heights = np.stack([hist.values() for hist in hists])
+    if density:
+        # Normalized as hist.Hist.density
+        totals = heights.sum(axis=-1, keepdims=True) * hists[0].axes[0].widths
+        heights = heights / np.where(totals > 0, totals, 1)
+    return heights
+
+
+def _max_hist_height(hists, density, stacked=False, heights=None):
     """
     Determine the maximum entry in a list of histograms.
 
@@ -279,60 +421,400 @@ def _max_hist_height(hists, density, stacked=False):
         hists (`lst`): List of histograms
         density (`bool`): If the histograms are density histograms
         stacked (`bool`): If the histograms are stacked histograms
+        heights (`array`): The bin heights of the histograms if already
+            computed by ``_hist_heights``
 
     Returns:
         `float`: The maximum value of any of the given histograms.
     """
     if not isinstance(hists, list):
         hists = [hists]
-    if not density:
-        if stacked:
-            max_hist = max(utils.sum_hists(hists).values())
-        else:
-            max_hist = max(max(hist.values()) for hist in hists)
-    else:
-        max_hist = max(max(hist.density()) for hist in hists)
-    return max_hist
+    if stacked and not density:
+        return max(utils.sum_hists(hists).values())
+    if heights is not None:
+        return heights.max()
+    edges = hists[0].axes[0].edges
+    if all(np.array_equal(hist.axes[0].edges, edges) for hist in hists[1:]):
+        return _hist_heights(hists, density).max()
+    return max(_hist_heights([hist], density).max() for hist in hists)
+
+
+def _plot_overlay(hists, ax, heights, values=None, cmap=None, colorbar_label=None):
+    """
+    Draw the outlines of many histograms as a single line collection colored by
+    a value per histogram.
+
+    Args:
+        hists (`lst`): List of histograms with the same binning
+        ax (`matplotlib.axes.Axes`): The axis to draw on
+        heights (`array`): The bin heights of the histograms
+        values (`array`): The value of each histogram mapped to the colormap,
+            e.g. the mass point of a signal sample. Defaults to the index.
+        cmap (`str` or `matplotlib.colors.Colormap`): The colormap
+        colorbar_label (`str`): The label of the colorbar
+
+    Returns:
+        `matplotlib.collections.LineCollection`: The drawn collection
+    """
+    edges = hists[0].axes[0].edges
+    # Step outlines through the bin edges at the height of each bin
+    x = np.repeat(edges, 2)[1:-1]
+    y = np.repeat(heights, 2, axis=-1)
+    segments = np.stack([np.broadcast_to(x, y.shape), y], axis=-1)
+
+    values = np.arange(len(hists)) if values is None else np.asarray(values)
+    collection = LineCollection(segments, cmap=cmap, array=values)
+    ax.add_collection(collection)
+    ax.autoscale_view()
+    ax.figure.colorbar(collection, ax=ax, label=colorbar_label)
+    return collection
+
+
+def _decimation_indices(hist, ax, decimate):
+    """
+    Determine the bin edges to keep to merge bins down to the display resolution.
+
+    Args:
+        hist (`hist.Hist`): The histogram to be drawn
+        ax (`matplotlib.axes.Axes`): The axis the histogram is drawn on
+        decimate (`bool` or `int`): If ``True`` merge bins down to the pixel width
+            of the axis. If an `int` merge bins down to at most that many bins.
+
+    Returns:
+        array: The indices of the bin edges to keep, or ``None`` if no merging is
+        needed
+    """
+    if not decimate:
+        return None
+    max_bins = int(ax.get_window_extent().width) if decimate is True else decimate
+    n_bins = hist.axes[0].size
+    if n_bins <= max_bins:
+        return None
+    return utils.decimation_indices(n_bins, max_bins)
 
 
-def _plot_uncertainty(model_hist, ax):
+def _merge_uncert(uncert, edge_indices):
+    """
+    Merge per bin uncertainties in quadrature to match merged bins, scaled up
+    for a padded partial last group as by ``heputils.utils.merge_bins``.
+
+    Args:
+        uncert (`array`): The uncertainty values, or the downward and upward
+            uncertainty values with shape ``(2, bins)``
+        edge_indices (`array`): The indices of the bin edges to keep
+
+    Returns:
+        `array`: The merged uncertainty values
+    """
+    if uncert is None or isinstance(uncert, bool) or edge_indices is None:
+        return uncert
+    merged = np.sqrt(np.add.reduceat(np.square(uncert), edge_indices[:-1], axis=-1))
+    return merged * utils.padding_scale(edge_indices)
+
+
+def _variations_array(variations, scale_factors=None):
+    """
+    Convert systematic variations to an array with the systematics along the
+    first axis that is not a sample axis.
+
+    Args:
+        variations (`array`, `hist.Hist`, or `list`): The variations of the summed
+            stack as an array with shape ``(systematics, bins)`` or a `hist.Hist`
+            with a category axis of systematics, or the variations of each sample
+            as an array with shape ``(samples, systematics, bins)`` or a list of
+            arrays or `hist.Hist` objects
+        scale_factors (`list`): The scale factors applied to each sample. Only
+            supported for the variations of each sample.
+
+    Returns:
+        `array`: The variations as an array
+    """
+    if isinstance(variations, (list, tuple)):
+        variations = np.stack([_variations_array(v) for v in variations])
+    elif hasattr(variations, "axes"):
+        syst_axis = [
+            idx
+            for idx, axis in enumerate(variations.axes)
+            if isinstance(axis, (IntCategory, StrCategory))
+        ]
+        if len(syst_axis) != 1:
+            raise ValueError(
+                "Histograms of variations must have exactly one category axis of systematics."
+            )
+        variations = np.moveaxis(variations.values(), syst_axis[0], 0)
+    variations = np.asarray(variations, dtype=float)
+    if scale_factors is not None:
+        if variations.ndim != 3:
+            # The summed stack can not be split to scale each sample
+            raise ValueError(
+                "scale_factors require the variations of each sample, "
+                "not of the summed stack."
+            )
+        variations = variations * np.asarray(scale_factors)[:, None, None]
+    return variations
+
+
+def _uncertainty_band(model_hist, variations, method, with_stat):
+    """
+    Determine the uncertainty band of the model and its legend label.
+
+    Args:
+        model_hist (`hist.Hist`): The histogram of the summed model
+        variations (`array`): The systematic variations of the model
+        method (`str`): How to combine the systematic variations
+        with_stat (`bool`): If the statistical uncertainty is added to the band
+
+    Returns:
+        `tuple`: The downward and upward band widths and the band label. The band
+        widths are ``None`` if there are no variations.
+    """
+    if variations is None:
+        return None, _uncertainty_labels[0]
+    variances = model_hist.variances() if with_stat else None
+    band = utils.systematic_band(model_hist.values(), variations, variances, method)
+    return band, _uncertainty_labels[2] if with_stat else _uncertainty_labels[1]
+
+
+@trace.traced("uncertainty")
+def _plot_uncertainty(model_hist, ax, band=None, label=_uncertainty_labels[0]):
     """
     Plot the model uncertainty as a bar plot
 
     Args:
         model_hist (`hist.Hist`): The histogram to calculate uncertainty for
         ax (`matplotlib.axes.Axes`): The axis the bar plot is drawn on
+        band (`tuple` of `array`): The downward and upward widths of the band.
+            Defaults to the statistical uncertainty of ``model_hist``.
+        label (`str`): The legend label of the band
 
     Returns:
         `matplotlib.axes.Axes`: The axis the bar plot is drawn on
     """
 
-    stat_uncert = np.sqrt(model_hist.variances())
+    if band is None:
+        stat_uncert = np.sqrt(model_hist.variances())
+        band = (stat_uncert, stat_uncert)
+    down_uncert, up_uncert = band
     bin_centers = model_hist.axes.centers[0]
     bin_widths = model_hist.axes.widths[0]
-    bar_bottom = model_hist.values() - stat_uncert
+    bar_bottom = model_hist.values() - down_uncert
     # Ensure uncertainties don't extend below 0
     bar_bottom[bar_bottom < 0] = 0
-    uncert_label = "Stat Uncertainty"
 
     ax.bar(
         bin_centers,
-        height=2 * stat_uncert,
+        height=down_uncert + up_uncert,
         width=bin_widths,
         bottom=bar_bottom,
         fill=False,
         linewidth=0,
         edgecolor="gray",
         hatch=3 * "/",
-        label=uncert_label,
+        label=label,
     )
     return ax
 
 
+@trace.traced("uncertainty")
+def _plot_ratio_uncertainty(model_hist, ax, band, denominator=None):
+    """
+    Plot the model uncertainty band relative to the ratio denominator
+
+    Args:
+        model_hist (`hist.Hist`): The histogram of the model
+        ax (`matplotlib.axes.Axes`): The ratio axis the bar plot is drawn on
+        band (`tuple` of `array`): The downward and upward widths of the band
+        denominator (`array`): The denominator of the ratio. Defaults to the
+            values of ``model_hist``.
+
+    Returns:
+        `matplotlib.axes.Axes`: The axis the bar plot is drawn on
+    """
+    values = model_hist.values()
+    denominator = values if denominator is None else denominator
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bar_bottom = (values - band[0]) / denominator
+        bar_top = (values + band[1]) / denominator
+    valid = np.isfinite(bar_bottom) & np.isfinite(bar_top)
+
+    ax.bar(
+        model_hist.axes.centers[0][valid],
+        height=(bar_top - bar_bottom)[valid],
+        width=model_hist.axes.widths[0][valid],
+        bottom=bar_bottom[valid],
+        fill=False,
+        linewidth=0,
+        edgecolor="gray",
+        hatch=3 * "/",
+    )
+    return ax
+
+
+@trace.traced("ratio")
+def _plot_ratio(
+    ax, edges, ratio, ratio_uncert, ylim=None, ylabel="Ratio", uncert_draw_type="line"
+):
+    """
+    Plot ratios and their uncertainties on the ratio axis
+
+    Args:
+        ax (`matplotlib.axes.Axes`): The ratio axis
+        edges (`array`): The bin edges
+        ratio (`array`): The ratio values
+        ratio_uncert (`array`): The downward and upward uncertainties of the ratios
+        ylim (`list`): The y-axis limits. Defaults to a range around 1 that
+            includes the ratios and their uncertainties.
+        ylabel (`str`): The y-axis label
+        uncert_draw_type (`str`): Draw the uncertainties as error bars with
+            ``"line"`` or as a hatched band with ``"bar"``
+
+    Returns:
+        `matplotlib.axes.Axes`: The ratio axis
+    """
+    central_value = 1.0
+    bin_centers = (edges[1:] + edges[:-1]) / 2
+    # Hide empty and infinite ratios
+    ratio = np.where((ratio == 0) | np.isinf(ratio), np.nan, ratio)
+
+    ax.axhline(central_value, color="black", linestyle="dashed", linewidth=1.0)
+    if uncert_draw_type == "line":
+        ax.errorbar(
+            bin_centers,
+            ratio,
+            yerr=ratio_uncert,
+            color="black",
+            marker="o",
+            linestyle="none",
+        )
+    elif uncert_draw_type == "bar":
+        _ratio_points = ax.scatter(bin_centers, ratio, color="black")
+        bar_bottom = np.nan_to_num(ratio - ratio_uncert[0])
+        ax.bar(
+            bin_centers,
+            height=ratio + ratio_uncert[1] - bar_bottom,
+            width=edges[1:] - edges[:-1],
+            bottom=bar_bottom,
+            fill=False,
+            linewidth=0,
+            edgecolor="gray",
+            hatch=3 * "/",
+            # Draw the ratio points above the uncertainty bars
+            zorder=_ratio_points.get_zorder() - 1,
+        )
+    else:
+        raise ValueError(
+            f"Unknown uncert_draw_type {uncert_draw_type}. Expected one of ['line', 'bar']."
+        )
+
+    if ylim is None:
+        # Center on the central value with a view range that includes the
+        # extrema of the ratios with their uncertainties
+        valid = ~np.isnan(ratio)
+        extrema = np.concatenate(
+            [
+                ratio[valid] - ratio_uncert[0][valid],
+                ratio[valid] + ratio_uncert[1][valid],
+            ]
+        )
+        extrema = extrema[np.isfinite(extrema)]
+        max_delta = np.amax(np.abs(extrema - central_value), initial=0.5)
+        ratio_extrema = np.abs(max_delta + central_value)
+        scaled_offset = max_delta + (max_delta / (2.0 * ratio_extrema))
+        ylim = [central_value - scaled_offset, central_value + scaled_offset]
+
+    ax.set_xlim(edges[0], edges[-1])
+    ax.set_ylim(bottom=ylim[0], top=ylim[1])
+    ax.set_ylabel(ylabel)
+    return ax
+
+
+def _draws_directly(hist, uncert):
+    """
+    Determine if a data histogram can be drawn without ``mplhep.histplot``.
+
+    Categorical axes, uncertainties in formats other than symmetric or
+    ``(down, up)`` arrays, and filled flow bins, for which ``histplot`` draws
+    hint markers, are left to ``histplot``.
+    """
+    if hist.ndim != 1:
+        return False
+    axis = hist.axes[0]
+    if isinstance(axis, (IntCategory, StrCategory)):
+        return False
+    if uncert is not False and np.ndim(uncert) not in (1, 2):
+        return False
+    traits = axis.traits
+    if traits.underflow or traits.overflow:
+        flow_values = hist.values(flow=True)
+        if traits.underflow and flow_values[0] != 0:
+            return False
+        if traits.overflow and flow_values[-1] != 0:
+            return False
+    return True
+
+
+def _draw_data(hist, uncert, density, color, label, ax):
+    """
+    Draw a 1D data histogram with the artists ``mplhep.histplot`` would create,
+    including its style defaults, which yield to those set by the style.
+
+    Args:
+        hist (`hist.Hist`): The histogram containing the data
+        uncert (`array` or `bool`): The uncertainty values, or ``False`` for none
+        density (`bool`): If ``True`` draw the density as a step outline
+        color (`str`): The color of the artists
+        label (`str`): The legend label
+        ax (`matplotlib.axes.Axes`): The axis object to plot on
+    """
+    edges = hist.axes[0].edges
+    values = np.array(hist.values(), dtype=float)
+    if density:
+        widths = np.diff(edges)
+        values /= widths * values.sum()
+        artist = ax.stairs(
+            values,
+            edges,
+            baseline=0,
+            **soft_update_kwargs({"color": color, "label": label}, {"linewidth": 1.5}),
+        )
+        artist.sticky_edges.y.append(0)
+    else:
+        centers = np.add(edges[1:], edges[:-1], out=np.empty(values.size))
+        centers *= 0.5
+        # histplot pins the errorbar container rather than its line, which
+        # autoscaling ignores, so the y-axis is left free below zero
+        ax.errorbar(
+            centers,
+            values,
+            yerr=uncert,
+            **soft_update_kwargs(
+                {"color": color, "label": label},
+                {"linestyle": "none", "marker": ".", "elinewidth": 1},
+            ),
+        )
+
+    if not ax.get_xlabel() and hist.axes[0].label:
+        ax.set_xlabel(hist.axes[0].label)
+
+
 def data_hist(hist, uncert=None, ax=None, **kwargs):
     """
     Plot a histogram styled as data.
 
+    1D histograms are drawn directly with ``errorbar`` (or ``stairs`` for
+    densities) rather than through ``mplhep.histplot``. Pass ``fast=False`` to
+    always draw with ``mplhep.histplot``.
+
+    For very finely binned histograms pass ``decimate=True`` to merge adjacent
+    bins down to the pixel width of the axis, or ``decimate=n_bins`` to merge
+    down to at most ``n_bins`` bins. Bins are merged in groups of equal size,
+    with a partial last group padded as by ``heputils.utils.merge_bins``.
+
+    To save the figure to file and close it once drawn pass ``output`` as the
+    output path, or as a dict of keyword arguments to
+    ``heputils.output.save_figure``. Add a ``heputils.output.AsyncSaver`` as
+    ``saver`` to the dict to write the files in the background.
+
     Args:
         hist (`hist.Hist`): The histogram containing the data
         uncert (`array`): The uncertainty values for the `hist`
@@ -341,42 +823,66 @@ def data_hist(hist, uncert=None, ax=None, **kwargs):
     Returns:
         `matplotlib.axes.Axes`: matplotlib subplot axis object
     """
-    if uncert is None:
-        uncert = np.sqrt(hist.values())
     if ax is None:
         ax = plt.gca()
     elif not kwargs.get("xlabel"):
         # Set from ax to avoid having hist.ax[0].label overwrite in histoplot
         kwargs["xlabel"] = ax.get_xlabel()
 
+    edge_indices = _decimation_indices(hist, ax, kwargs.pop("decimate", False))
+    if edge_indices is not None:
+        x_range = hist.axes[0].edges[[0, -1]]
+        hist = utils.merge_bins(hist, edge_indices, pad=True)
+        uncert = _merge_uncert(uncert, edge_indices)
+    if uncert is None:
+        uncert = np.sqrt(hist.values())
+
     # get all the kwargs
+    output = kwargs.pop("output", None)
     color = kwargs.pop("color", "black")
     label = kwargs.pop("label", "Data")
     density = kwargs.pop("density", False)
+    fast = kwargs.pop("fast", True)
     if density:
         histtype = "step"
         uncert = False  # histplot treats yerr as iterable or bool
     else:
         histtype = "errorbar"
 
-    histplot(
-        hist,
-        yerr=uncert,
-        histtype=histtype,
-        density=density,
-        color=color,
-        label=label,
-        ax=ax,
-    )
+    with trace.phase("histplot"):
+        if fast and _draws_directly(hist, uncert):
+            _draw_data(hist, uncert, density, color, label, ax)
+        else:
+            histplot(
+                hist,
+                yerr=uncert,
+                histtype=histtype,
+                density=density,
+                color=color,
+                label=label,
+                ax=ax,
+            )
 
+    if edge_indices is not None:
+        # Hide the padding of a partial last group of merged bins
+        ax.set_xlim(*x_range)
     ax = draw_experiment_label(ax, density=density, **kwargs)
-    return _plot_ax_kwargs(ax, **kwargs)
+    result = _plot_ax_kwargs(ax, **kwargs)
+    _save_output(ax.figure, output)
+    return result
 
 
 def shape_hist(hists, ax=None, **kwargs):
     """
     Plot the shape outline of all the input histograms
 
+    To compare the shapes of many samples, such as a scan of signal mass
+    points, pass ``overlay=True`` to draw all outlines as a single line
+    collection colored by ``overlay_values`` with the colormap ``cmap`` and a
+    colorbar labeled ``colorbar_label``, instead of an artist and legend entry
+    per histogram. The histograms must share their binning, and ``labels`` are
+    not supported as the histograms are told apart by the colorbar.
+
     Args:
         hists (list): List of `hist.Hist` objects representing histograms
         ax (`matplotlib.axes.Axes`): The axis object to plot on
@@ -400,6 +906,17 @@ def shape_hist(hists, ax=None, **kwargs):
     histtype = kwargs.pop("histtype", "fill")
     _default_alpha = 0.1 if histtype == "fill" else None
     alpha = kwargs.pop("alpha", _default_alpha)
+    decimate = kwargs.pop("decimate", False)
+    output = kwargs.pop("output", None)
+    overlay = kwargs.pop("overlay", False)
+    overlay_values = kwargs.pop("overlay_values", None)
+    cmap = kwargs.pop("cmap", None)
+    colorbar_label = kwargs.pop("colorbar_label", None)
+    if overlay and labels is not None:
+        raise ValueError(
+            "labels are not supported with overlay=True. "
+            "Use overlay_values and colorbar_label instead."
+        )
 
     if ax is None:
         ax = plt.gca()
@@ -407,47 +924,80 @@ def shape_hist(hists, ax=None, **kwargs):
         # Set from ax to avoid having hists[0].ax[0].label overwrite in histoplot
         kwargs["xlabel"] = ax.get_xlabel()
 
-    histplot(
-        hists,
-        stack=False,
-        histtype=histtype,
-        density=density,
-        yerr=False,
-        label=labels,
-        color=color,
-        alpha=alpha,
-        ax=ax,
-    )
+    edge_indices = _decimation_indices(hists[0], ax, decimate)
+    if edge_indices is not None:
+        x_range = hists[0].axes[0].edges[[0, -1]]
+        hists = utils.merge_bins(hists, edge_indices, pad=True)
+        if _data_hist is not None:
+            _data_hist = utils.merge_bins(_data_hist, edge_indices, pad=True)
+            data_uncert = _merge_uncert(data_uncert, edge_indices)
+
+    heights = None
+    if overlay:
+        with trace.phase("histplot"):
+            heights = _hist_heights(hists, density)
+            _plot_overlay(
+                hists,
+                ax,
+                heights,
+                values=overlay_values,
+                cmap=cmap,
+                colorbar_label=colorbar_label,
+            )
+    else:
+        with trace.phase("histplot"):
+            histplot(
+                hists,
+                stack=False,
+                histtype=histtype,
+                density=density,
+                yerr=False,
+                label=labels,
+                color=color,
+                alpha=alpha,
+                ax=ax,
+            )
 
     if _data_hist is not None:
         ax = data_hist(
             _data_hist, uncert=data_uncert, label=data_label, density=density, ax=ax
         )
 
+    max_hist = _max_hist_height(hists, density, heights=heights)
     if semilogy:
         ax.semilogy()
         # Ensure enough space for legend
-        max_hist = _max_hist_height(hists, density)
         ax.set_ylim(top=max_hist * 100)
 
     # TODO: Avoid drawing twice
     if _data_hist is not None:
-        max_hist = max(
-            _max_hist_height(hists, density), _max_hist_height(_data_hist, density)
-        )
-    else:
-        max_hist = _max_hist_height(hists, density)
+        max_hist = max(max_hist, _max_hist_height(_data_hist, density))
+    if edge_indices is not None:
+        # Hide the padding of a partial last group of merged bins
+        ax.set_xlim(*x_range)
     ax = draw_experiment_label(
         ax, max_height=max_hist, logy=semilogy, density=density, **kwargs
     )
 
-    return _plot_ax_kwargs(ax, **kwargs)
+    result = _plot_ax_kwargs(ax, **kwargs)
+    _save_output(ax.figure, output)
+    return result
 
 
 def stack_hist(hists, ax=None, **kwargs):
     """
     Plot a stacked histogram of all the input histograms
 
+    The uncertainty band of the stack includes systematic variations if they
+    are given as ``syst_variations``: either the varied stack as an array with
+    shape ``(systematics, bins)`` or a `hist.Hist` with a category axis of
+    systematics, or the varied samples as an array with shape
+    ``(samples, systematics, bins)`` or a list of arrays or `hist.Hist` objects.
+    They are combined according to ``syst_method``, either ``"envelope"``
+    (default) or ``"quadrature"``, and are added in quadrature to the statistical
+    uncertainty unless ``syst_stat=False``. With ``scale_factors`` the varied
+    samples are required, as they are scaled like the nominal samples.
+
     Args:
         hists (list): List of `hist.Hist` objects representing histograms
         ax (`matplotlib.axes.Axes`): The axis object to plot on
@@ -470,6 +1020,11 @@ def stack_hist(hists, ax=None, **kwargs):
     _data_hist = kwargs.pop("data_hist", None)
     data_uncert = kwargs.pop("data_uncert", None)
     data_label = kwargs.pop("data_label", "Data")
+    decimate = kwargs.pop("decimate", False)
+    output = kwargs.pop("output", None)
+    syst_variations = kwargs.pop("syst_variations", None)
+    syst_method = kwargs.pop("syst_method", "envelope")
+    syst_stat = kwargs.pop("syst_stat", True)
 
     if ax is None:
         ax = plt.gca()
@@ -477,6 +1032,21 @@ def stack_hist(hists, ax=None, **kwargs):
         # Set from ax to avoid having hists[0].ax[0].label overwrite in histoplot
         kwargs["xlabel"] = ax.get_xlabel()
 
+    if syst_variations is not None:
+        syst_variations = _variations_array(syst_variations, scale_factors)
+
+    edge_indices = _decimation_indices(hists[0], ax, decimate)
+    if edge_indices is not None:
+        x_range = hists[0].axes[0].edges[[0, -1]]
+        hists = utils.merge_bins(hists, edge_indices, pad=True)
+        if _data_hist is not None:
+            _data_hist = utils.merge_bins(_data_hist, edge_indices, pad=True)
+            data_uncert = _merge_uncert(data_uncert, edge_indices)
+        if syst_variations is not None:
+            syst_variations = np.add.reduceat(
+                syst_variations, edge_indices[:-1], axis=-1
+            ) * utils.padding_scale(edge_indices)
+
     if all(v is not None for v in [labels, scale_factors]):
         labels = [
             label if sf == 1 else f"{label} X {sf}"
@@ -485,20 +1055,25 @@ def stack_hist(hists, ax=None, **kwargs):
     if scale_factors is not None:
         hists = [h * sf for h, sf in zip(hists, scale_factors)]
 
-    histplot(
-        hists,
-        stack=True,
-        histtype="fill",
-        label=labels,
-        color=color,
-        alpha=alpha,
-        ax=ax,
-    )
+    with trace.phase("histplot"):
+        histplot(
+            hists,
+            stack=True,
+            histtype="fill",
+            label=labels,
+            color=color,
+            alpha=alpha,
+            ax=ax,
+        )
 
     # Inspired by cabinetry
     # https://github.com/alexander-held/cabinetry/blob/aa36561eba458d47a17a4a7db1ffdce08417ce89/src/cabinetry/contrib/matplotlib_visualize.py#L87
-    stack_hist = utils.sum_hists(hists)
-    ax = _plot_uncertainty(stack_hist, ax)
+    with trace.phase("uncertainty"):
+        stack_hist = utils.sum_hists(hists)
+        band, band_label = _uncertainty_band(
+            stack_hist, syst_variations, syst_method, syst_stat
+        )
+    ax = _plot_uncertainty(stack_hist, ax, band=band, label=band_label)
 
     if _data_hist is not None:
         ax = data_hist(_data_hist, uncert=data_uncert, label=data_label, ax=ax)
@@ -510,27 +1085,39 @@ def stack_hist(hists, ax=None, **kwargs):
 
     # TODO: Avoid drawing twice
     max_hist = _max_hist_height(hists, density=False, stacked=True)
+    if edge_indices is not None:
+        # Hide the padding of a partial last group of merged bins
+        ax.set_xlim(*x_range)
     ax = draw_experiment_label(ax, max_height=max_hist, **kwargs)
 
-    return _plot_ax_kwargs(ax, **kwargs)
+    result = _plot_ax_kwargs(ax, **kwargs)
+    _save_output(ax.figure, output)
+    return result
 
 
 def stack_ratio_plot(hists, **kwargs):
     """
     Stack plot on top, ratio plot on bottom
+
+    The ratios and their uncertainties are computed with ``heputils.utils.ratio``
+    using the interval given by ``rp_uncertainty_type``. Ratios precomputed for
+    many plots at once can be passed as ``rp_ratio``, a tuple of the ratio
+    values and their uncertainties for this plot.
     """
-    fig = kwargs.pop("fig", plt.gcf())
+    fig = kwargs.pop("fig", None)
+    if fig is None:
+        fig = plt.gcf()
+    output = kwargs.pop("output", None)
 
     # Scale figure height to deal with ratio subplot being added
     fig_height_scale = kwargs.pop("fig_height_scale", 1.25)
-    _fig_width, _fig_height = get_style()["figure.figsize"]
+    _fig_width, _fig_height = plt.rcParams["figure.figsize"]
     fig.set_size_inches(_fig_width, _fig_height * fig_height_scale, forward=True)
 
-    # Setup figure subplot grid and axis dict for hist.plot_ratio
+    # Setup figure subplot grid
     grid = fig.add_gridspec(2, 1, hspace=0, height_ratios=[3, 1])
     main_ax = fig.add_subplot(grid[0])
     subplot_ax = fig.add_subplot(grid[1], sharex=main_ax)
-    ax_dict = {"main_ax": main_ax, "ratio_ax": subplot_ax}
 
     labels = kwargs.pop("labels", None)
     color = kwargs.pop("color", None)
@@ -540,33 +1127,74 @@ def stack_ratio_plot(hists, **kwargs):
     semilogy = kwargs.pop("logy", True)
     _data_hist = kwargs.pop("data_hist", None)
 
+    # Merge bins once so the stack, data, and ratio panels share the binning
+    edge_indices = _decimation_indices(hists[0], main_ax, kwargs.pop("decimate", False))
+    if edge_indices is not None:
+        x_range = hists[0].axes[0].edges[[0, -1]]
+        hists = utils.merge_bins(hists, edge_indices, pad=True)
+        _data_hist = utils.merge_bins(_data_hist, edge_indices, pad=True)
+        if "data_uncert" in kwargs:
+            kwargs["data_uncert"] = _merge_uncert(kwargs["data_uncert"], edge_indices)
+
+    syst_variations = kwargs.get("syst_variations", None)
+    if syst_variations is not None:
+        syst_variations = _variations_array(syst_variations)
+        if edge_indices is not None:
+            syst_variations = np.add.reduceat(
+                syst_variations, edge_indices[:-1], axis=-1
+            ) * utils.padding_scale(edge_indices)
+        # Pass the array through to stack_hist to not convert again
+        kwargs["syst_variations"] = syst_variations
+
     # Setup and plot the ratio plot
     ratio_plot_numerator = kwargs.pop("ratio_numerator", "data")
+    ratio_uncertainty_type = kwargs.pop("rp_uncertainty_type", "poisson")
+    precomputed_ratio = kwargs.pop("rp_ratio", None)
     ratio_plot_kwargs = {
-        "ax_dict": ax_dict,
-        "rp_ylim": kwargs.pop("rp_ylim", None),
-        "rp_uncertainty_type": kwargs.pop("rp_uncertainty_type", "poisson"),
-        "rp_uncert_draw_type": kwargs.pop("rp_uncert_draw_type", "line"),
+        "ylim": kwargs.pop("rp_ylim", None),
+        "uncert_draw_type": kwargs.pop("rp_uncert_draw_type", "line"),
     }
 
     # .get not .pop to pass scale_factors through to stack_hist too
     scale_factors = kwargs.get("scale_factors", None)
-    num_hists = (
-        utils.sum_hists(hists)
-        if scale_factors is None
-        else utils.sum_hists([h * sf for h, sf in zip(hists, scale_factors)])
-    )
+    num_hists = utils.sum_hists(hists, scale_factors=scale_factors)
 
     if ratio_plot_numerator.lower() in ["simulation", "sim", "mc"]:
-        ratio_plot_kwargs["rp_ylabel"] = kwargs.pop("rp_ylabel", "MC/Data")
-        num_hists.plot_ratio(_data_hist, **ratio_plot_kwargs)
+        ratio_ylabel = "MC/Data"
+        ratio_numerator, ratio_denominator = num_hists.values(), _data_hist.values()
+        band_denominator = _data_hist.values()
     else:
-        ratio_plot_kwargs["rp_ylabel"] = kwargs.pop("rp_ylabel", "Data/MC")
-        _data_hist.plot_ratio(num_hists, **ratio_plot_kwargs)
+        ratio_ylabel = "Data/MC"
+        ratio_numerator, ratio_denominator = _data_hist.values(), num_hists.values()
+        band_denominator = None
+    if precomputed_ratio is None:
+        with trace.phase("ratio"):
+            precomputed_ratio = utils.ratio(
+                ratio_numerator,
+                ratio_denominator,
+                uncertainty_type=ratio_uncertainty_type,
+            )
+    if ratio_uncertainty_type == "efficiency":
+        ratio_ylabel = "Efficiency"
+        if ratio_plot_kwargs["ylim"] is None:
+            ratio_plot_kwargs["ylim"] = [0, 1.1]
+    ratio_plot_kwargs["ylabel"] = kwargs.pop("rp_ylabel", ratio_ylabel)
+    _plot_ratio(
+        subplot_ax, num_hists.axes[0].edges, *precomputed_ratio, **ratio_plot_kwargs
+    )
     subplot_ax.set_xlabel(kwargs.get("xlabel", None))
 
-    # FIXME: Ugly hack to overwrite ratio plot main axis
-    main_ax.clear()
+    if syst_variations is not None:
+        band, _ = _uncertainty_band(
+            num_hists,
+            _variations_array(syst_variations, scale_factors),
+            kwargs.get("syst_method", "envelope"),
+            kwargs.get("syst_stat", True),
+        )
+        _plot_ratio_uncertainty(
+            num_hists, subplot_ax, band, denominator=band_denominator
+        )
+
     main_ax = stack_hist(
         hists,
         labels=labels,
@@ -578,6 +1206,9 @@ def stack_ratio_plot(hists, **kwargs):
         **kwargs,
     )
 
+    if edge_indices is not None:
+        # Hide the padding of a partial last group of merged bins
+        main_ax.set_xlim(*x_range)
     # Hide tick marks of main_ax
     plt.setp(main_ax.get_xticklabels(), visible=False)
     # Trying to get things looking okay
@@ -585,4 +1216,310 @@ def stack_ratio_plot(hists, **kwargs):
         # Ensure enough space for legend
         main_ax.set_ylim(top=main_ax.get_ylim()[-1] * 100)
 
+    _save_output(fig, output)
     return main_ax, subplot_ax
+
+
+def _is_uniform(edges):
+    widths = np.diff(edges)
+    return np.allclose(widths, widths[0], rtol=1e-6, atol=0)
+
+
+def _decimate_axis(values, edges, max_bins, axis):
+    """
+    Sum adjacent bins along an axis of a 2D histogram into at most ``max_bins``
+    groups of equal size.
+
+    A partial last group is padded beyond the end of the axis and scaled up to
+    the full group size, as by ``heputils.utils.merge_bins`` with ``pad=True``,
+    so uniform edges stay uniform and a flat distribution stays flat.
+
+    Args:
+        values (`array`): The bin values
+        edges (`array`): The bin edges along ``axis``
+        max_bins (int): The maximum number of bins after merging
+        axis (int): The axis to merge bins along
+
+    Returns:
+        tuple: The merged values and their bin edges
+    """
+    edge_indices = utils.decimation_indices(values.shape[axis], max_bins)
+    scale = np.expand_dims(utils.padding_scale(edge_indices), 1 - axis)
+    values = np.add.reduceat(values, edge_indices[:-1], axis=axis) * scale
+    return values, utils.padded_edges(edges, edge_indices)
+
+
+def hist2d(hist, ax=None, **kwargs):
+    """
+    Plot a 2D histogram as a colored map.
+
+    Histograms with uniform binning along both axes are drawn as a single image
+    with ``imshow``, others with ``pcolormesh``. Meshes with more than
+    ``rasterize_threshold`` cells (default 10000) are rasterized in vector
+    outputs to keep the file size and drawing time down.
+
+    For very finely binned histograms pass ``decimate=True`` to sum adjacent
+    bins down to the pixel size of the axis, or ``decimate=n_bins`` to sum down
+    to at most ``n_bins`` bins along each axis. Bins are summed in groups of
+    equal size, so that uniform axes are still drawn as an image. If the number
+    of bins is not a multiple of the group size, the last, partial group is
+    padded beyond the end of the axis and its sum is scaled up to the full
+    group size.
+
+    Example:
+
+        >>> import numpy as np
+        >>> import hist
+        >>> import matplotlib.pyplot as plt
+        >>> import heputils
+        >>> occupancy = hist.Hist(
+        ...     hist.axis.Regular(100, -2.5, 2.5, label=r"$\\eta$"),
+        ...     hist.axis.Regular(64, -np.pi, np.pi, label=r"$\\phi$"),
+        ... ).fill(np.random.normal(size=1000), np.random.uniform(-3, 3, size=1000))
+        >>> ax = heputils.plot.hist2d(occupancy, ax=plt.figure().add_subplot(), logz=True)
+        >>> type(ax.images[0]).__name__
+        'AxesImage'
+        >>> plt.close(ax.figure)
+
+    Args:
+        hist (`hist.Hist`): The 2D histogram
+        ax (`matplotlib.axes.Axes`): The axis object to plot on
+
+    Returns:
+        `matplotlib.axes.Axes`: matplotlib subplot axis object
+    """
+    if ax is None:
+        ax = plt.gca()
+
+    cmap = kwargs.pop("cmap", None)
+    logz = kwargs.pop("logz", False)
+    colorbar_label = kwargs.pop("colorbar_label", None)
+    rasterize_threshold = kwargs.pop("rasterize_threshold", 10000)
+    decimate = kwargs.pop("decimate", False)
+    output = kwargs.pop("output", None)
+    xlabel = kwargs.pop("xlabel", ax.get_xlabel() or hist.axes[0].label)
+    ylabel = kwargs.pop("ylabel", ax.get_ylabel() or hist.axes[1].label)
+    title = kwargs.pop("title", ax.get_title())
+
+    values = hist.values()
+    x_edges, y_edges = hist.axes.edges
+    x_edges, y_edges = x_edges.ravel(), y_edges.ravel()
+    x_range, y_range = x_edges[[0, -1]], y_edges[[0, -1]]
+    if decimate:
+        if decimate is True:
+            extent = ax.get_window_extent()
+            max_bins = (int(extent.width), int(extent.height))
+        else:
+            max_bins = (decimate, decimate)
+        for axis, n_max in enumerate(max_bins):
+            if values.shape[axis] <= n_max:
+                continue
+            if axis == 0:
+                values, x_edges = _decimate_axis(values, x_edges, n_max, axis)
+            else:
+                values, y_edges = _decimate_axis(values, y_edges, n_max, axis)
+
+    norm = LogNorm() if logz else None
+    with trace.phase("histplot"):
+        if _is_uniform(x_edges) and _is_uniform(y_edges):
+            artist = ax.imshow(
+                values.T,
+                origin="lower",
+                extent=(x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]),
+                aspect="auto",
+                interpolation="nearest",
+                cmap=cmap,
+                norm=norm,
+            )
+        else:
+            artist = ax.pcolormesh(
+                x_edges,
+                y_edges,
+                values.T,
+                cmap=cmap,
+                norm=norm,
+                rasterized=values.size > rasterize_threshold,
+            )
+    # Hide groups padded beyond the end of the axes when decimating
+    ax.set_xlim(*x_range)
+    ax.set_ylim(*y_range)
+    ax.figure.colorbar(artist, ax=ax, label=colorbar_label)
+
+    ax = draw_experiment_label(ax, **kwargs)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    _save_output(ax.figure, output)
+    return ax
+
+
+def warmup(style=None):
+    """
+    Initialize the font, mathtext, and style caches used when plotting.
+
+    The first plot in a fresh process pays for loading fonts, parsing the
+    mathtext of the experiment label, and validating the style. Call this
+    once per process, e.g. as the initializer of a pool of worker processes, so
+    that the first real plot is as fast as the following ones.
+
+    Example:
+
+        >>> import heputils
+        >>> heputils.plot.warmup("ATLAS")
+
+    Args:
+        style (str or `mplhep.style` dict): The experiment style to set and warm
+            up. If ``None`` the current style is warmed up, without the
+            experiment label if no experiment style is set.
+    """
+    if style is not None:
+        set_style(style)
+    font_manager.findfont(
+        font_manager.FontProperties(family=plt.rcParams["font.family"])
+    )
+
+    # Draw a minimal plot with the experiment label and legend
+    _hist = convert.numpy_to_hist(np.array([1.0, 2.0]), np.array([0.0, 1.0, 2.0]))
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    if get_experiment_info()["name"] is None:
+        # Without an experiment style there is no experiment label to draw
+        ax = fig.add_subplot()
+        histplot(_hist, label="warmup", ax=ax)
+        ax.legend()
+    else:
+        stack_ratio_plot([_hist], data_hist=_hist, labels=["warmup"], fig=fig)
+    fig.canvas.draw()
+    fig.clear()
+
+
+def _peak_rss():
+    """
+    The peak resident set size of the process in bytes, or ``None`` if it can
+    not be determined on the platform.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+class FigurePool:
+    """
+    Provide reusable figures for plotting loops.
+
+    Figures from the pool are not managed by ``pyplot``, so they do not pile up
+    in its figure manager. Released figures are cleared, resized to the current
+    style's ``figure.figsize``, and handed out again. All figures are cleared
+    when the pool is closed, even if an exception was raised.
+
+    Example:
+
+        >>> import heputils
+        >>> heputils.plot.set_style("ATLAS")
+        >>> with heputils.plot.FigurePool() as pool:  # doctest: +SKIP
+        ...     for name, _hists in regions.items():
+        ...         with pool.figure() as fig:
+        ...             heputils.plot.stack_hist(
+        ...                 _hists, ax=fig.add_subplot(), output=f"{name}.pdf"
+        ...             )
+
+    Args:
+        max_size (int): The maximum number of released figures kept for reuse
+        hook (callable): Called with a dict of the pool statistics each time a
+            figure is released and when the pool is closed. The statistics are
+            the number of figures created (``figures_created``), currently in
+            use (``in_use``), the peak number of figures alive at once
+            (``peak_figures``), and the peak resident set size of the process in
+            bytes (``peak_rss``).
+    """
+
+    def __init__(self, max_size=4, hook=None):
+        self.max_size = max_size
+        self.hook = hook
+        self._free = []
+        self._in_use = set()
+        self._figures_created = 0
+        self._peak_figures = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def stats(self):
+        """The current pool statistics."""
+        return {
+            "figures_created": self._figures_created,
+            "in_use": len(self._in_use),
+            "peak_figures": self._peak_figures,
+            "peak_rss": _peak_rss(),
+        }
+
+    def _report(self):
+        if self.hook is not None:
+            self.hook(self.stats)
+
+    def acquire(self):
+        """
+        Get a cleared figure sized to the current style's ``figure.figsize``.
+
+        Returns:
+            `matplotlib.figure.Figure`: The figure
+        """
+        if self._free:
+            fig = self._free.pop()
+            fig.set_dpi(plt.rcParams["figure.dpi"])
+            fig.set_size_inches(plt.rcParams["figure.figsize"])
+        else:
+            fig = Figure()
+            # Attach a canvas with a renderer for the label layout
+            FigureCanvasAgg(fig)
+            self._figures_created += 1
+        self._in_use.add(fig)
+        self._peak_figures = max(
+            self._peak_figures, len(self._in_use) + len(self._free)
+        )
+        return fig
+
+    def release(self, fig):
+        """
+        Clear a figure and return it to the pool.
+
+        Args:
+            fig (`matplotlib.figure.Figure`): A figure acquired from the pool
+        """
+        self._in_use.discard(fig)
+        fig.clear()
+        if len(self._free) < self.max_size:
+            self._free.append(fig)
+        self._report()
+
+    @contextlib.contextmanager
+    def figure(self):
+        """
+        Acquire a figure for the duration of the context.
+
+        Yields:
+            `matplotlib.figure.Figure`: The figure
+        """
+        fig = self.acquire()
+        try:
+            yield fig
+        finally:
+            self.release(fig)
+
+    def close(self):
+        """
+        Clear all figures and empty the pool.
+        """
+        for fig in self._free + list(self._in_use):
+            fig.clear()
+        self._free.clear()
+        self._in_use.clear()
+        self._report()
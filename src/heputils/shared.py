@@ -0,0 +1,283 @@
+"""Share histograms between processes without pickling their contents."""
+
+import sys
+
+import numpy as np
+from hist import Hist
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python 3.7
+    shared_memory = None
+
+# Align each array to a cache line
+_alignment = 64
+
+# Shared memory blocks attached in this process keyed by block name
+_attached = {}
+
+
+class HistHandle:
+    """
+    A small picklable reference to a histogram published to shared memory.
+
+    The handle holds the axes, storage type, and location of the bin contents
+    in the shared memory block, but not the bin contents themselves.
+    """
+
+    __slots__ = (
+        "block",
+        "offset",
+        "shape",
+        "dtype",
+        "axes",
+        "storage",
+        "name",
+        "label",
+    )
+
+    def __init__(self, block, offset, shape, dtype, axes, storage, name, label):
+        self.block = block
+        self.offset = offset
+        self.shape = shape
+        self.dtype = dtype
+        self.axes = axes
+        self.storage = storage
+        self.name = name
+        self.label = label
+
+    def __getstate__(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            setattr(self, key, value)
+
+
+class SharedHist:
+    """
+    A read-only view of a histogram published to shared memory.
+
+    The bin contents are not copied, so any number of processes can read the
+    same histogram at the memory cost of one. `hist.Hist` objects always own
+    their storage, so ``to_hist`` copies the bin contents into a new histogram.
+
+    Args:
+        handle (`heputils.shared.HistHandle`): The handle of the histogram
+    """
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.axes = handle.axes
+        self._view = _array(handle)
+
+    def view(self, flow=False):
+        """
+        The bin contents without copying.
+
+        Args:
+            flow (bool): If ``True`` include the flow bins
+
+        Returns:
+            `numpy.ndarray`: The read-only bin contents, a structured array for
+            storages with multiple fields such as ``Weight``
+        """
+        if flow:
+            return self._view
+        return self._view[
+            tuple(
+                slice(axis.traits.underflow, axis.traits.underflow + axis.size)
+                for axis in self.axes
+            )
+        ]
+
+    def values(self, flow=False):
+        """
+        The bin values without copying.
+
+        Args:
+            flow (bool): If ``True`` include the flow bins
+
+        Returns:
+            `numpy.ndarray`: The read-only bin values
+        """
+        view = self.view(flow=flow)
+        return view["value"] if view.dtype.names else view
+
+    def variances(self, flow=False):
+        """
+        The bin variances without copying, if the storage tracks them.
+
+        Args:
+            flow (bool): If ``True`` include the flow bins
+
+        Returns:
+            `numpy.ndarray`: The read-only bin variances, or ``None`` if the
+            storage does not track variances
+        """
+        view = self.view(flow=flow)
+        if view.dtype.names and "variance" in view.dtype.names:
+            return view["variance"]
+        return None
+
+    def to_hist(self):
+        """
+        Copy the histogram out of shared memory.
+
+        Returns:
+            `hist.Hist`: The histogram
+        """
+        _hist = Hist(
+            *self.axes,
+            storage=self.handle.storage(),
+            name=self.handle.name,
+            label=self.handle.label,
+        )
+        _hist.view(flow=True)[...] = self._view
+        return _hist
+
+
+def _require_shared_memory():
+    if shared_memory is None:
+        raise RuntimeError("Sharing histograms requires Python 3.8 or later.")
+
+
+def _attach_block(block_name):
+    block = _attached.get(block_name)
+    if block is None:
+        _require_shared_memory()
+        if sys.version_info >= (3, 13):
+            # The publisher owns the block, so don't clean it up on exit here
+            block = shared_memory.SharedMemory(name=block_name, track=False)
+        else:
+            block = shared_memory.SharedMemory(name=block_name)
+        _attached[block_name] = block
+    return block
+
+
+def _array(handle):
+    block = _attach_block(handle.block)
+    array = np.ndarray(
+        handle.shape, dtype=handle.dtype, buffer=block.buf, offset=handle.offset
+    )
+    array.flags.writeable = False
+    return array
+
+
+def attach(handles):
+    """
+    Attach to histograms published by a ``heputils.shared.HistogramPublisher``.
+
+    Example:
+
+        >>> import hist
+        >>> import heputils
+        >>> _hist = hist.Hist(hist.axis.Regular(4, 0, 4)).fill([0, 1, 1, 3])
+        >>> with heputils.shared.HistogramPublisher({"jet_mass": _hist}) as publisher:
+        ...     shared_hists = heputils.shared.attach(publisher.handles)
+        ...     shared_hists["jet_mass"].values().tolist()
+        ...     heputils.shared.detach()
+        [1.0, 2.0, 0.0, 1.0]
+
+    Args:
+        handles (dict): The `heputils.shared.HistHandle` objects keyed by name
+
+    Returns:
+        dict: The `heputils.shared.SharedHist` views keyed by name
+    """
+    return {name: SharedHist(handle) for name, handle in handles.items()}
+
+
+def detach():
+    """
+    Release all shared memory blocks attached in this process.
+
+    Views of the attached histograms must not be used afterwards.
+    """
+    for block in _attached.values():
+        try:
+            block.close()
+        except BufferError:
+            # Views are still alive, so leave the mapping to the garbage collector
+            pass
+    _attached.clear()
+
+
+class HistogramPublisher:
+    """
+    Publish histograms to a shared memory block for worker processes.
+
+    The bin contents of all histograms are copied once into a single shared
+    memory block. Workers receive only the small picklable ``handles``, which
+    describe the axes and where the bin contents are, and attach to the block
+    with ``heputils.shared.attach``. The publisher owns the block and frees it
+    when it is closed, so it must outlive the workers' use of the histograms.
+
+    Example:
+
+        >>> import multiprocessing
+        >>> import heputils
+        >>> with heputils.shared.HistogramPublisher(hists) as publisher:  # doctest: +SKIP
+        ...     with multiprocessing.Pool(4) as pool:
+        ...         pool.map(work, [publisher.handles] * 4)
+
+    Args:
+        hists (dict): The `hist.Hist` objects to publish keyed by name
+    """
+
+    def __init__(self, hists):
+        _require_shared_memory()
+        layout = {}
+        size = 0
+        for name, _hist in hists.items():
+            view = _hist.view(flow=True)
+            layout[name] = (size, view)
+            size += -(-view.nbytes // _alignment) * _alignment
+
+        self._block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.handles = {}
+        for name, (offset, view) in layout.items():
+            _hist = hists[name]
+            array = np.ndarray(
+                view.shape, dtype=view.dtype, buffer=self._block.buf, offset=offset
+            )
+            array[...] = view
+            self.handles[name] = HistHandle(
+                self._block.name,
+                offset,
+                view.shape,
+                np.dtype(view.dtype),
+                tuple(_hist.axes),
+                _hist.storage_type,
+                _hist.name,
+                _hist.label,
+            )
+            del array
+
+    @property
+    def nbytes(self):
+        """The size of the shared memory block in bytes."""
+        return 0 if self._block is None else self._block.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Free the shared memory block.
+        """
+        if self._block is None:
+            return
+        # Release any attachment to the block in this process first
+        attached = _attached.pop(self._block.name, None)
+        if attached is not None:
+            try:
+                attached.close()
+            except BufferError:
+                pass
+        self._block.close()
+        self._block.unlink()
+        self._block = None
@@ -0,0 +1,163 @@
+"""Compatibility tests between data and predictions."""
+
+import csv
+
+import numpy as np
+
+from heputils import utils
+
+_table_dtype = [
+    ("name", object),
+    ("chi2", float),
+    ("ndf", int),
+    ("chi2_pvalue", float),
+    ("ks_stat", float),
+    ("ks_pvalue", float),
+    ("llr", float),
+    ("llr_pvalue", float),
+]
+
+
+def compatibility(data, prediction, variance=None, names=None):
+    """
+    Compute the compatibility of data with predictions for many regions at once.
+
+    All tests are computed for all regions in a single vectorized pass. For each
+    region the table holds
+
+    - ``chi2``, ``ndf``, ``chi2_pvalue``: The chi-square with the Poisson
+      variance of the data, or of the prediction for bins without data, and the
+      variance of the prediction
+    - ``ks_stat``, ``ks_pvalue``: The Kolmogorov-Smirnov statistic between the
+      normalized cumulative distributions and its asymptotic p-value for the
+      number of data events
+    - ``llr``, ``llr_pvalue``: The Poisson likelihood ratio test statistic
+      :math:`-2\\ln\\lambda` against the saturated model
+
+    Bins where the data or prediction are not finite, such as padding for
+    regions with fewer bins, and bins without data or prediction are ignored.
+
+    Example:
+
+        >>> import numpy as np
+        >>> import heputils
+        >>> data = np.array([[10, 20, 30], [12, 18, 35]])
+        >>> prediction = np.array([[11.0, 19.0, 31.0], [10.0, 20.0, 30.0]])
+        >>> table = heputils.stats.compatibility(data, prediction, names=["SR", "CR"])
+        >>> table["name"].tolist()
+        ['SR', 'CR']
+        >>> table["ndf"].tolist()
+        [3, 3]
+        >>> np.round(table["chi2"], 3).tolist()
+        [0.183, 1.27]
+
+    Args:
+        data (`array`): The observed counts with shape ``(regions, bins)``
+        prediction (`array`): The predicted counts with shape ``(regions, bins)``
+        variance (`array`): The variances of the prediction with shape
+            ``(regions, bins)``. Defaults to no uncertainty on the prediction.
+        names (`list` of `str`): The names of the regions. Defaults to the index
+            of the region.
+
+    Returns:
+        `numpy.recarray`: The table of test results with one row per region
+    """
+    # Imported here to keep the import of heputils fast
+    from scipy import stats as _stats
+
+    data = np.atleast_2d(np.asarray(data, dtype=float))
+    prediction = np.atleast_2d(np.asarray(prediction, dtype=float))
+    variance = (
+        np.zeros_like(prediction)
+        if variance is None
+        else np.atleast_2d(np.asarray(variance, dtype=float))
+    )
+    n_regions = data.shape[0]
+
+    valid = np.isfinite(data) & np.isfinite(prediction) & np.isfinite(variance)
+    valid &= (data > 0) | (prediction > 0)
+    data = np.where(valid, data, 0.0)
+    prediction = np.where(valid, prediction, 0.0)
+    variance = np.where(valid, variance, 0.0)
+    ndf = valid.sum(axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Fall back to the predicted Poisson variance for bins without data
+        data_variance = np.where(data > 0, data, prediction)
+        chi2_terms = np.square(data - prediction) / (data_variance + variance)
+        chi2 = np.where(valid, chi2_terms, 0.0).sum(axis=1)
+
+        llr_terms = prediction - data
+        llr_terms += np.where(data > 0, data * np.log(data / prediction), 0.0)
+        llr = 2.0 * np.where(valid, llr_terms, 0.0).sum(axis=1)
+
+        data_total = data.sum(axis=1)
+        data_cdf = np.cumsum(data, axis=1) / data_total[:, None]
+        prediction_cdf = np.cumsum(prediction, axis=1) / prediction.sum(axis=1)[:, None]
+    ks_stat = np.abs(data_cdf - prediction_cdf).max(axis=1, initial=0.0)
+    sqrt_n = np.sqrt(data_total)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ks_pvalue = _stats.kstwobign.sf((sqrt_n + 0.12 + 0.11 / sqrt_n) * ks_stat)
+
+    table = np.recarray(n_regions, dtype=_table_dtype)
+    table["name"] = list(range(n_regions)) if names is None else list(names)
+    table["chi2"] = chi2
+    table["ndf"] = ndf
+    table["chi2_pvalue"] = _stats.chi2.sf(chi2, ndf)
+    table["ks_stat"] = ks_stat
+    table["ks_pvalue"] = ks_pvalue
+    table["llr"] = llr
+    table["llr_pvalue"] = _stats.chi2.sf(llr, ndf)
+    return table
+
+
+def compare_hists(data_hist, hists, scale_factors=None, name=None):
+    """
+    Compute the compatibility of a data histogram with a stack of histograms.
+
+    The stack is summed in the same way as in ``heputils.plot.stack_ratio_plot``
+    so the results match the plots.
+
+    Args:
+        data_hist (`hist.Hist`): The histogram of the data
+        hists (list): List of `hist.Hist` objects making up the stack
+        scale_factors (list): The scale factors applied to the histograms
+        name (str): The name of the region
+
+    Returns:
+        `numpy.recarray`: The table of test results with a single row
+    """
+    stack_hist = utils.sum_hists(hists, scale_factors=scale_factors)
+    return compatibility(
+        data_hist.values(),
+        stack_hist.values(),
+        stack_hist.variances(),
+        names=None if name is None else [name],
+    )
+
+
+def write_table(table, path):
+    """
+    Write a table of test results to file.
+
+    The format is determined by the file extension, either CSV (``.csv``) or
+    Parquet (``.parquet``). Writing Parquet requires ``pyarrow``.
+
+    Args:
+        table (`numpy.recarray`): The table of test results
+        path (str): The output path
+    """
+    if path.endswith(".parquet"):
+        # Imported here to keep the import of heputils fast
+        import awkward as ak
+
+        columns = {field: table[field] for field in table.dtype.names}
+        columns["name"] = [str(name) for name in table["name"]]
+        ak.to_parquet(ak.Array(columns), path)
+    elif path.endswith(".csv"):
+        with open(path, "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(table.dtype.names)
+            writer.writerows(table.tolist())
+    else:
+        raise ValueError(f"Unable to determine the table format of {path}.")
@@ -0,0 +1,189 @@
+"""Time the phases of plot generation."""
+
+import atexit
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+
+class Profile:
+    """
+    The timings of the phases recorded while profiling.
+
+    Each event is a tuple of the phase name, the start time and duration in
+    nanoseconds, and the process and thread ids it was recorded in.
+    """
+
+    def __init__(self):
+        self.events = []
+
+    def stats(self):
+        """
+        Aggregate the timings of each phase.
+
+        Returns:
+            dict: The number of calls (``count``), and the ``total``, ``mean``,
+            ``min``, and ``max`` durations in seconds keyed by phase name
+        """
+        durations = {}
+        for name, _, duration, _, _ in self.events:
+            durations.setdefault(name, []).append(duration)
+        stats = {}
+        for name, _durations in durations.items():
+            _durations = np.asarray(_durations) * 1e-9
+            stats[name] = {
+                "count": int(_durations.size),
+                "total": float(_durations.sum()),
+                "mean": float(_durations.mean()),
+                "min": float(_durations.min()),
+                "max": float(_durations.max()),
+            }
+        return stats
+
+    def chrome_trace(self):
+        """
+        The events in the Chrome trace event format, which can be opened with
+        ``chrome://tracing`` or https://ui.perfetto.dev.
+
+        Returns:
+            dict: The trace
+        """
+        return {
+            "traceEvents": [
+                {
+                    "name": name,
+                    "cat": "heputils",
+                    "ph": "X",
+                    "ts": start / 1e3,
+                    "dur": duration / 1e3,
+                    "pid": pid,
+                    "tid": tid,
+                }
+                for name, start, duration, pid, tid in self.events
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+    def save(self, path):
+        """
+        Write the events to a Chrome trace JSON file.
+
+        Args:
+            path (str): The output path
+        """
+        with open(path, "w") as trace_file:
+            json.dump(self.chrome_trace(), trace_file)
+
+
+class _Phase:
+    __slots__ = ("name", "profile", "start")
+
+    def __init__(self, name, profile):
+        self.name = name
+        self.profile = profile
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = time.perf_counter_ns() - self.start
+        self.profile.events.append(
+            (self.name, self.start, duration, os.getpid(), threading.get_ident())
+        )
+
+
+# Shared no-op context manager so disabled timers cost a single check
+_null_phase = contextlib.nullcontext()
+
+# Profile from startup if requested through the environment. If the variable
+# is a path ending in .json the trace is written there when the process exits.
+_env_profile = os.environ.get("HEPUTILS_PROFILE", "")
+_profile = Profile() if _env_profile not in ("", "0") else None
+if _env_profile.endswith(".json"):
+    atexit.register(_profile.save, _env_profile)
+
+
+def phase(name):
+    """
+    Time a phase of plot generation if profiling is enabled.
+
+    Args:
+        name (str): The name of the phase
+
+    Returns:
+        A context manager timing its block
+    """
+    if _profile is None:
+        return _null_phase
+    return _Phase(name, _profile)
+
+
+def traced(name):
+    """
+    Decorator to time each call of a function as a phase if profiling is enabled.
+
+    Args:
+        name (str): The name of the phase
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _profile is None:
+                return func(*args, **kwargs)
+            with _Phase(name, _profile):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def current():
+    """
+    The active profile, or ``None`` if profiling is disabled.
+
+    Returns:
+        `heputils.trace.Profile`: The active profile
+    """
+    return _profile
+
+
+@contextlib.contextmanager
+def profile():
+    """
+    Profile the phases of plot generation within the block.
+
+    Profiling can also be enabled for the whole process by setting the
+    ``HEPUTILS_PROFILE`` environment variable to ``1``, or to the path of a
+    ``.json`` file to write the trace to on exit. Events recorded within the
+    block are also added to any enclosing profile.
+
+    Example:
+
+        >>> import heputils
+        >>> with heputils.trace.profile() as profile:  # doctest: +SKIP
+        ...     heputils.plot.stack_hist(hists, data_hist=data_hist)
+        ...
+        >>> sorted(profile.stats())  # doctest: +SKIP
+        ['histplot', 'label_layout', 'legend', 'uncertainty']
+        >>> profile.save("trace.json")  # doctest: +SKIP
+
+    Yields:
+        `heputils.trace.Profile`: The profile the events are recorded in
+    """
+    global _profile
+    enclosing = _profile
+    _profile = Profile()
+    try:
+        yield _profile
+    finally:
+        if enclosing is not None:
+            enclosing.events.extend(_profile.events)
+        _profile = enclosing
@@ -1,8 +1,17 @@
 import functools
+import math
 import operator
 
+import hist
+import numpy as np
+from hist import Hist
 
-def sum_hists(hists):
+# The central coverage of one standard deviation of a normal distribution
+_one_sigma_coverage = math.erf(1 / math.sqrt(2))
+_integer_storages = (hist.storage.Int64, hist.storage.AtomicInt64)
+
+
+def sum_hists(hists, scale_factors=None):
     """
     Create a histogram from the sum of a list of `hist` histograms.
 
@@ -37,8 +46,471 @@ def sum_hists(hists):
 
     Args:
         hists (`list`): A list of `hist` histograms
+        scale_factors (`list`): The factors to scale each histogram by before
+            summing
 
     Returns:
         hist.Hist.hist: The histogram that is the sum of the histograms in the list.
     """
+    if scale_factors is not None:
+        hists = [_hist * sf for _hist, sf in zip(hists, scale_factors)]
     return functools.reduce(operator.add, hists)
+
+
+def decimation_indices(n_bins, max_bins):
+    """
+    Determine the edge indices that merge groups of adjacent bins such that there
+    are no more than ``max_bins`` bins.
+
+    Bins are merged in groups of equal size. A group size that divides
+    ``n_bins`` is used if it leaves at least half of ``max_bins`` bins.
+    Otherwise the last group is partial and holds fewer bins than the others.
+    Pass ``pad=True`` to ``heputils.utils.merge_bins`` to extend it to the full
+    group size.
+
+    Example:
+
+        >>> import heputils.utils as utils
+        >>> utils.decimation_indices(12, 5)
+        array([ 0,  3,  6,  9, 12])
+        >>> utils.decimation_indices(11, 4)
+        array([ 0,  3,  6,  9, 11])
+        >>> utils.decimation_indices(10, 20)
+        array([ 0,  1,  2,  3,  4,  5,  6,  7,  8,  9, 10])
+
+    Args:
+        n_bins (`int`): The number of bins
+        max_bins (`int`): The maximum number of bins after merging
+
+    Returns:
+        array: The indices of the bin edges to keep
+    """
+    max_bins = max(max_bins, 1)
+    min_group_size = max(math.ceil(n_bins / max_bins), 1)
+    for group_size in range(min_group_size, 2 * min_group_size + 1):
+        if n_bins % group_size == 0 and n_bins // group_size >= max_bins // 2:
+            return np.arange(0, n_bins + 1, group_size)
+    return np.append(np.arange(0, n_bins, min_group_size), n_bins)
+
+
+def padding_scale(edge_indices):
+    """
+    The factors that scale the sums of groups of merged bins up to the size of
+    the first group.
+
+    The factor of a partial last group is the size of a full group over its own
+    size. The factors of all other groups are one.
+
+    Example:
+
+        >>> import heputils.utils as utils
+        >>> utils.padding_scale([0, 3, 6, 9, 11])
+        array([1. , 1. , 1. , 1.5])
+
+    Args:
+        edge_indices (array): The indices of the bin edges to keep
+
+    Returns:
+        array: The scale factor of each group
+    """
+    group_sizes = np.diff(edge_indices)
+    return group_sizes[0] / group_sizes
+
+
+def padded_edges(edges, edge_indices):
+    """
+    The edges of groups of merged bins with a partial last group extended
+    beyond the end of the axis to the size of the first group.
+
+    The bins added by the extension have the mean width of the bins of the
+    last group, so for uniform binning all merged bins are of equal width.
+
+    Example:
+
+        >>> import numpy as np
+        >>> import heputils.utils as utils
+        >>> utils.padded_edges(np.linspace(0, 11, 12), [0, 3, 6, 9, 11])
+        array([ 0.,  3.,  6.,  9., 12.])
+
+    Args:
+        edges (array): The bin edges
+        edge_indices (array): The indices of the bin edges to keep
+
+    Returns:
+        array: The edges of the merged bins
+    """
+    edge_indices = np.asarray(edge_indices)
+    merged_edges = np.asarray(edges, dtype=float)[edge_indices]
+    group_sizes = np.diff(edge_indices)
+    last_width = (merged_edges[-1] - merged_edges[-2]) / group_sizes[-1]
+    merged_edges[-1] += (group_sizes[0] - group_sizes[-1]) * last_width
+    return merged_edges
+
+
+def merge_bins(hists, edge_indices, pad=False):
+    """
+    Merge adjacent bins of 1D histograms that share the same binning.
+
+    The bin contents and variances of all of the histograms with the same
+    storage type are summed at once with ``np.add.reduceat``. Underflow and
+    overflow bins are kept as is.
+
+    With ``pad=True`` a last group with fewer bins than the first, such as from
+    ``heputils.utils.decimation_indices``, is extended beyond the end of the
+    axis to the full group size with ``heputils.utils.padded_edges``. Its sum is
+    scaled up by ``heputils.utils.padding_scale``, so that a flat distribution
+    stays flat. Histograms with integer storage are then converted to double
+    storage.
+
+    Example:
+
+        >>> import numpy as np
+        >>> import hist
+        >>> import heputils.utils as utils
+        >>> h = hist.Hist(hist.axis.Regular(4, 0, 4), storage=hist.storage.Weight())
+        >>> h = h.fill([0.5, 1.5, 1.5, 2.5, 3.5, 3.5, 3.5])
+        >>> merged_hist = utils.merge_bins(h, [0, 2, 3, 4])
+        >>> merged_hist.axes[0].edges
+        array([0., 2., 3., 4.])
+        >>> merged_hist.values()
+        array([3., 1., 3.])
+        >>> merged_hist.variances()
+        array([3., 1., 3.])
+
+    Args:
+        hists (`list` or `hist.Hist`): A list of `hist` histograms or a single
+            histogram
+        edge_indices (array): The indices of the bin edges to keep. Must include
+            the first and last bin edge.
+        pad (bool): If ``True`` extend a partial last group to the full group
+            size
+
+    Returns:
+        `list` or hist.Hist.hist: The histograms with merged bins
+    """
+    if not isinstance(hists, (list, tuple)):
+        return merge_bins([hists], edge_indices, pad=pad)[0]
+
+    edge_indices = np.asarray(edge_indices)
+    axis = hists[0].axes[0]
+    if edge_indices[0] != 0 or edge_indices[-1] != axis.size:
+        raise ValueError(
+            f"edge_indices must start at 0 and end at {axis.size}, the number of bins."
+        )
+    if len(edge_indices) - 1 == axis.size:
+        return list(hists)
+
+    scale = padding_scale(edge_indices) if pad else np.ones(len(edge_indices) - 1)
+    padded = np.any(scale != 1)
+    merged_axis = hist.axis.Variable(
+        padded_edges(axis.edges, edge_indices) if padded else axis.edges[edge_indices],
+        name=axis.name,
+        label=axis.label,
+        underflow=axis.traits.underflow,
+        overflow=axis.traits.overflow,
+    )
+
+    # Keep any flow bins in place and merge only the in-range bins
+    underflow = int(axis.traits.underflow)
+    reduce_indices = np.concatenate(
+        [
+            np.arange(underflow),
+            edge_indices[:-1] + underflow,
+            np.arange(
+                axis.size + underflow, axis.size + underflow + axis.traits.overflow
+            ),
+        ]
+    )
+
+    flow_scale = np.concatenate(
+        [np.ones(underflow), scale, np.ones(int(axis.traits.overflow))]
+    )
+
+    # Merge all histograms with the same storage type in a single reduceat
+    merged_hists = [
+        Hist(
+            merged_axis,
+            storage=(
+                hist.storage.Double()
+                if padded and _hist.storage_type in _integer_storages
+                else _hist.storage_type()
+            ),
+        )
+        for _hist in hists
+    ]
+    storage_groups = {}
+    for idx, _hist in enumerate(hists):
+        storage_groups.setdefault(_hist.storage_type, []).append(idx)
+    for storage_type, group in storage_groups.items():
+        views = np.stack([np.asarray(hists[idx].view(flow=True)) for idx in group])
+        merged_views = [np.asarray(merged_hists[idx].view(flow=True)) for idx in group]
+        fields = views.dtype.names
+        if fields is None:
+            merged = np.add.reduceat(views, reduce_indices, axis=1) * flow_scale
+            for merged_view, merged_values in zip(merged_views, merged):
+                merged_view[...] = merged_values
+        elif set(fields) == {"value", "variance"}:
+            for field, field_scale in zip(
+                ["value", "variance"], [flow_scale, np.square(flow_scale)]
+            ):
+                merged = np.add.reduceat(views[field], reduce_indices, axis=1)
+                merged *= field_scale
+                for merged_view, merged_values in zip(merged_views, merged):
+                    merged_view[field] = merged_values
+        else:
+            raise ValueError(
+                f"Unable to merge bins of histograms with {storage_type} storage."
+            )
+    return merged_hists
+
+
+def systematic_band(nominal, variations, variances=None, method="envelope"):
+    """
+    Compute the downward and upward uncertainty band of a prediction from its
+    systematic variations in a single vectorized pass.
+
+    Example:
+
+        >>> import numpy as np
+        >>> import heputils.utils as utils
+        >>> nominal = np.array([10.0, 20.0])
+        >>> variations = np.array([[12.0, 19.0], [9.0, 23.0], [11.0, 20.0]])
+        >>> down, up = utils.systematic_band(nominal, variations)
+        >>> down, up
+        (array([1., 1.]), array([2., 3.]))
+        >>> down, up = utils.systematic_band(nominal, variations, method="quadrature")
+        >>> up
+        array([2.23606798, 3.        ])
+
+    Args:
+        nominal (`array`): The nominal prediction with shape ``(bins,)``
+        variations (`array`): The varied predictions with shape
+            ``(systematics, bins)``, or ``(samples, systematics, bins)`` for
+            variations of each sample of a stack, which are summed over samples
+        variances (`array`): The statistical variances of the nominal prediction.
+            If given they are added in quadrature to the band.
+        method (`str`): How to combine the systematic shifts. ``"envelope"`` takes
+            the largest upward and downward shift in each bin, ``"quadrature"``
+            sums the upward and downward shifts in quadrature.
+
+    Returns:
+        Tuple of NumPy arrays: The non-negative downward and upward band widths
+    """
+    nominal = np.asarray(nominal, dtype=float)
+    variations = np.asarray(variations, dtype=float)
+    if variations.ndim == nominal.ndim + 2:
+        variations = variations.sum(axis=0)
+    shifts = variations - nominal
+
+    if method == "envelope":
+        up = np.max(shifts, axis=0, initial=0.0)
+        down = -np.min(shifts, axis=0, initial=0.0)
+    elif method == "quadrature":
+        up = np.sqrt(np.sum(np.square(np.clip(shifts, 0.0, None)), axis=0))
+        down = np.sqrt(np.sum(np.square(np.clip(shifts, None, 0.0)), axis=0))
+    else:
+        raise ValueError(
+            f"Unknown method {method}. Expected one of ['envelope', 'quadrature']."
+        )
+
+    if variances is not None:
+        stat_uncert = np.sqrt(variances)
+        up = np.hypot(up, stat_uncert)
+        down = np.hypot(down, stat_uncert)
+    return down, up
+
+
+def _clopper_pearson_interval(num, denom, coverage, out):
+    """
+    Compute the Clopper-Pearson interval of a binomial efficiency into ``out``.
+
+    Args:
+        num (`array`): The number of successes
+        denom (`array`): The number of trials
+        coverage (float): The central coverage of the interval
+        out (`array`): The output array with shape ``(2,) + num.shape``
+
+    Returns:
+        `array`: The lower and upper bounds of the interval
+    """
+    # Imported here to keep the import of heputils fast
+    from scipy import special
+
+    with np.errstate(invalid="ignore"):
+        special.betaincinv(num, denom - num + 1, (1 - coverage) / 2, out=out[0])
+        special.betaincinv(num + 1, denom - num, (1 + coverage) / 2, out=out[1])
+    out[0][num == 0] = 0.0
+    out[1][num == denom] = 1.0
+    return out
+
+
+def ratio(numerator, denominator, uncertainty_type="poisson", coverage=None, out=None):
+    """
+    Compute the ratios of many numerator and denominator arrays and the
+    uncertainties of the ratios in a single vectorized pass.
+
+    The inputs can have any shape, e.g. ``(plots, bins)``, so the ratios of
+    many plots can be computed in one call. The uncertainty types match those of
+    ``hist.intervals.ratio_uncertainty``:
+
+    - ``"poisson"``: The Garwood interval of a Poisson distributed numerator
+      scaled by the denominator
+    - ``"poisson-ratio"``: The interval of the ratio of the rates of two
+      independent Poisson distributions, from the Clopper-Pearson interval
+    - ``"efficiency"``: The Clopper-Pearson interval of a binomial efficiency,
+      only valid if the numerator is a subset of the denominator
+
+    Example:
+
+        >>> import numpy as np
+        >>> import heputils.utils as utils
+        >>> numerator = np.array([[10.0, 20.0], [5.0, 0.0]])
+        >>> denominator = np.array([[10.0, 10.0], [10.0, 10.0]])
+        >>> ratios, uncert = utils.ratio(numerator, denominator)
+        >>> ratios
+        array([[1. , 2. ],
+               [0.5, 0. ]])
+        >>> uncert.shape
+        (2, 2, 2)
+        >>> np.round(uncert[:, 0, 0], 3)
+        array([0.311, 0.427])
+
+    Args:
+        numerator (`array`): The numerator values
+        denominator (`array`): The denominator values with the same shape
+        uncertainty_type (`str`): The interval to use for the uncertainties
+        coverage (float): The central coverage of the interval. Defaults to one
+            standard deviation, roughly 0.68.
+        out (`tuple` of `array`): Preallocated arrays for the ratios and the
+            uncertainties, with shapes ``numerator.shape`` and
+            ``(2,) + numerator.shape``
+
+    Returns:
+        Tuple of NumPy arrays: The ratios and the downward and upward
+        uncertainties of the ratios stacked along the first axis
+    """
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    if coverage is None:
+        coverage = _one_sigma_coverage
+    if out is None:
+        out = (np.empty(numerator.shape), np.empty((2,) + numerator.shape))
+    ratios, uncert = out
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Nota bene: x/0 = inf, 0/0 = nan
+        np.divide(numerator, denominator, out=ratios)
+
+        if uncertainty_type == "poisson":
+            # Imported here to keep the import of heputils fast
+            from scipy import special
+
+            # The Garwood interval of the numerator counts scaled by the denominator
+            special.gammaincinv(numerator, (1 - coverage) / 2, out=uncert[0])
+            special.gammaincinv(numerator + 1, (1 + coverage) / 2, out=uncert[1])
+            uncert[0][numerator == 0] = 0.0
+            uncert[1][numerator == 0] = np.nan
+            np.divide(uncert, denominator, out=uncert)
+        elif uncertainty_type == "poisson-ratio":
+            _clopper_pearson_interval(
+                numerator, numerator + denominator, coverage, out=uncert
+            )
+            np.divide(uncert, 1 - uncert, out=uncert)
+        elif uncertainty_type == "efficiency":
+            if np.any(numerator > denominator):
+                raise ValueError(
+                    "Found numerator larger than denominator while calculating binomial uncertainty"
+                )
+            _clopper_pearson_interval(numerator, denominator, coverage, out=uncert)
+        else:
+            raise ValueError(
+                f"Unknown uncertainty_type {uncertainty_type}. Expected one of ['poisson', 'poisson-ratio', 'efficiency']."
+            )
+        np.subtract(uncert, ratios, out=uncert)
+        np.abs(uncert, out=uncert)
+    return ratios, uncert
+
+
+def _precision_edge_indices(values, variances, target):
+    """
+    Find the edge indices of the fewest merged bins, scanning from the lowest
+    bin, such that each merged bin has a relative statistical uncertainty of at
+    most ``target``.
+
+    Args:
+        values (`array`): The bin contents
+        variances (`array`): The variances of the bin contents
+        target (float): The maximum relative statistical uncertainty
+
+    Returns:
+        array: The indices of the bin edges to keep
+    """
+    cumulative_values = np.concatenate([[0.0], np.cumsum(values)])
+    cumulative_variances = np.concatenate([[0.0], np.cumsum(variances)])
+    # Compare squares to avoid square roots and divisions in the scan
+    target_squared = target**2
+
+    edge_indices = [0]
+    start_value, start_variance = 0.0, 0.0
+    for idx in range(1, len(cumulative_values)):
+        merged_value = cumulative_values[idx] - start_value
+        merged_variance = cumulative_variances[idx] - start_variance
+        if merged_value > 0 and merged_variance <= target_squared * merged_value**2:
+            edge_indices.append(idx)
+            start_value = cumulative_values[idx]
+            start_variance = cumulative_variances[idx]
+
+    n_bins = len(values)
+    if edge_indices[-1] != n_bins:
+        # Merge the remaining bins that do not reach the target into the last bin
+        if len(edge_indices) > 1:
+            edge_indices[-1] = n_bins
+        else:
+            edge_indices.append(n_bins)
+    return np.asarray(edge_indices)
+
+
+def rebin_to_precision(hists, target, reference=None):
+    """
+    Merge adjacent bins of histograms such that the relative statistical
+    uncertainty of each bin of their sum is at most ``target``.
+
+    The merged binning is found with a single scan over the cumulative sums of
+    the summed values and variances, and is applied to all histograms at once
+    with ``heputils.utils.merge_bins``. Bins that do not reach the target at the
+    end of the range are merged into the last bin.
+
+    Example:
+
+        >>> import numpy as np
+        >>> import hist
+        >>> import heputils.utils as utils
+        >>> h = hist.Hist(hist.axis.Regular(5, 0, 5), storage=hist.storage.Weight())
+        >>> h[...] = np.stack([[100, 4, 21, 50, 1], [100, 4, 21, 50, 1]], axis=-1)
+        >>> utils.rebin_to_precision([h], 0.2)[0].axes[0].edges
+        array([0., 1., 3., 5.])
+
+    Args:
+        hists (`list`): A list of `hist` histograms that share the same binning,
+            e.g. the samples of a stack and data
+        target (float): The maximum relative statistical uncertainty of a bin
+        reference (`list`): The histograms whose sum determines the binning.
+            Defaults to all of ``hists``, which may mix storage types such as
+            weighted samples and unweighted data. Pass the samples of a stack to
+            not include data.
+
+    Returns:
+        list: The histograms with merged variable width bins
+    """
+    # Sum the arrays rather than the histograms to allow mixed storage types
+    reference = hists if reference is None else reference
+    values = np.sum([_hist.values() for _hist in reference], axis=0)
+    variances = np.sum(
+        [
+            _hist.values() if _hist.variances() is None else _hist.variances()
+            for _hist in reference
+        ],
+        axis=0,
+    )
+    edge_indices = _precision_edge_indices(values, variances, target)
+    return merge_bins(list(hists), edge_indices)
@@ -0,0 +1,215 @@
+"""Re-render plots as their input ROOT files change."""
+
+import hashlib
+import logging
+import os
+import struct
+import time
+
+import numpy as np
+import uproot
+
+from heputils import batch
+from heputils import plot
+
+log = logging.getLogger(__name__)
+
+# Errors raised when reading a file that is still being written
+_read_errors = (OSError, ValueError, struct.error, uproot.DeserializationError)
+
+
+def content_hash(hist):
+    """
+    Compute a digest of the binning and contents of a histogram.
+
+    Example:
+
+        >>> import numpy as np
+        >>> import hist
+        >>> import heputils
+        >>> h1 = hist.Hist(hist.axis.Regular(10, 0, 10)).fill([1, 2, 3])
+        >>> h2 = h1.copy()
+        >>> heputils.watch.content_hash(h1) == heputils.watch.content_hash(h2)
+        True
+        >>> h2.fill([4])
+        Hist(Regular(10, 0, 10, label='Axis 0'), storage=Double()) # Sum: 4.0
+        >>> heputils.watch.content_hash(h1) == heputils.watch.content_hash(h2)
+        False
+
+    Args:
+        hist (`hist.Hist`): The histogram to hash
+
+    Returns:
+        str: The hex digest of the histogram
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for edges in hist.axes.edges:
+        digest.update(np.ascontiguousarray(edges).tobytes())
+    digest.update(np.ascontiguousarray(hist.view(flow=True)).tobytes())
+    return digest.hexdigest()
+
+
+def _key_fingerprint(key):
+    # Rewriting a histogram in a ROOT file writes a new key record, so the
+    # on-disk location, size, and timestamp identify a version without reading it
+    return (key.fSeekKey, key.fNbytes, key.fObjlen, key.fDatime, key.fCycle)
+
+
+class HistogramWatcher:
+    """
+    Poll input ROOT files and re-render only the plots whose histograms changed.
+
+    Each poll compares the file modification times, then the key records of
+    the histograms in the changed files, and only reads histograms whose key
+    records differ. Plots are re-rendered if the content hash of any of the
+    histograms they depend on differs from their last successful render, so a
+    plot that failed to render is tried again on the next poll.
+
+    Plots refer to histograms by name only, so all files share one namespace.
+    If several files contain a histogram of the same name, the one in the
+    file that comes last in ``paths`` is used.
+
+    Args:
+        paths (`list` of `str`): The input ROOT files
+        specs (dict): The plot specifications keyed by plot name, as described in
+            ``heputils.batch.load_specs``
+        output_dir (str): The directory to write the plots to
+        formats (`tuple` of `str`): The file formats to save
+    """
+
+    def __init__(self, paths, specs, output_dir, formats=("pdf",)):
+        self.paths = list(paths)
+        self.specs = specs
+        self.output_dir = output_dir
+        self.formats = tuple(formats)
+        self._file_hists = {}
+        self._file_hashes = {}
+        self._file_stats = {}
+        self._key_fingerprints = {}
+        # The content hashes of the histograms of each plot at its last render
+        self._rendered_hashes = {}
+
+    def _changed_files(self):
+        changed = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                log.warning(f"Unable to stat {path}. Skipping until next poll.")
+                continue
+            file_stat = (stat.st_mtime_ns, stat.st_size)
+            if self._file_stats.get(path) != file_stat:
+                changed.append((path, file_stat))
+        return changed
+
+    def _latest(self, file_items):
+        items = {}
+        for path in self.paths:
+            items.update(file_items.get(path, {}))
+        return items
+
+    @property
+    def hists(self):
+        """
+        The latest histograms read from all files keyed by name.
+        """
+        return self._latest(self._file_hists)
+
+    def _read_changed_hists(self, path):
+        # Read the whole file before recording anything as seen, so that a
+        # failed read of a file mid-write leaves it to be read again next poll
+        fingerprints = {}
+        updated = {}
+        file_hashes = self._file_hashes.get(path, {})
+        with uproot.open(path) as root_file:
+            classnames = root_file.classnames(recursive=True, cycle=False)
+            for name, classname in classnames.items():
+                if not classname.startswith(("TH1", "TH2", "TH3")):
+                    continue
+                fingerprint = _key_fingerprint(root_file.key(name))
+                if self._key_fingerprints.get((path, name)) == fingerprint:
+                    continue
+                _hist = root_file[name].to_hist()
+                fingerprints[(path, name)] = fingerprint
+
+                digest = content_hash(_hist)
+                if file_hashes.get(name) != digest:
+                    updated[name] = (_hist, digest)
+
+        self._key_fingerprints.update(fingerprints)
+        file_hists = self._file_hists.setdefault(path, {})
+        file_hashes = self._file_hashes.setdefault(path, {})
+        for name, (_hist, digest) in updated.items():
+            file_hists[name] = _hist
+            file_hashes[name] = digest
+        return set(updated)
+
+    def poll(self):
+        """
+        Check the input files once and re-render the affected plots.
+
+        A plot that fails to render is logged and skipped, and is tried again
+        on the next poll.
+
+        Returns:
+            dict: The paths of the saved files keyed by re-rendered plot name
+        """
+        changed = set()
+        for path, file_stat in self._changed_files():
+            try:
+                changed |= self._read_changed_hists(path)
+            except _read_errors as err:
+                # The file may be mid-write, so try again next poll
+                log.warning(f"Unable to read {path}: {err}")
+                continue
+            self._file_stats[path] = file_stat
+
+        hashes = self._latest(self._file_hashes)
+        affected = {}
+        for name, spec in self.specs.items():
+            required = batch.required_hists(spec)
+            missing = required - hashes.keys()
+            if missing:
+                if required & changed:
+                    log.warning(f"Skipping plot {name}. Missing histograms: {missing}")
+                continue
+            plot_hashes = {hist_name: hashes[hist_name] for hist_name in required}
+            if self._rendered_hashes.get(name) != plot_hashes:
+                affected[name] = plot_hashes
+
+        if not affected:
+            return {}
+        log.info(f"Re-rendering {len(affected)} plots: {sorted(affected)}")
+        hists = self.hists
+        rendered = {}
+        os.makedirs(self.output_dir, exist_ok=True)
+        with plot.FigurePool(max_size=1) as pool:
+            for name, plot_hashes in affected.items():
+                try:
+                    rendered[name] = batch.render_plot(
+                        self.specs[name],
+                        hists,
+                        os.path.join(self.output_dir, name),
+                        self.formats,
+                        pool=pool,
+                    )
+                except Exception:
+                    log.exception(f"Unable to render plot {name}. Retrying next poll.")
+                    continue
+                self._rendered_hashes[name] = plot_hashes
+        return rendered
+
+    def run(self, interval=1.0, max_polls=None):
+        """
+        Poll the input files until interrupted.
+
+        Args:
+            interval (float): The time in seconds between polls
+            max_polls (int): The number of polls after which to stop. If ``None``
+                poll forever.
+        """
+        n_polls = 0
+        while max_polls is None or n_polls < max_polls:
+            self.poll()
+            n_polls += 1
+            time.sleep(interval)
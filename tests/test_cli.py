@@ -15,3 +15,25 @@ def test_version(script_runner):
     assert ret.stderr == ""
     # make sure it took less than a second
     assert elapsed < 1.0
+
+
+def test_bench(script_runner, tmp_path):
+    results_path = tmp_path / "results.json"
+    command = f"heputils bench -k sum_hists -k stack_hist --repeat 1 --bins 50 --samples 4 -o {results_path} --trace {tmp_path / 'trace.json'}"
+    ret = script_runner.run(*shlex.split(command))
+    assert ret.success
+    assert "stack_hist" in ret.stdout
+
+    results = heputils.benchmark.load(results_path)
+    assert sorted(results["results"]) == ["stack_hist", "sum_hists"]
+    assert len(results["results"]["sum_hists"]["times"]) == 1
+    assert results["results"]["stack_hist"]["peak_memory"] > 0
+    assert results["phases"]["histplot"]["count"] > 0
+    assert (tmp_path / "trace.json").exists()
+
+    ratios = heputils.benchmark.compare(results, results)
+    assert ratios["sum_hists"]["median"] == 1.0
+
+    command = f"heputils bench -k not_a_benchmark -o {results_path}"
+    ret = script_runner.run(*shlex.split(command))
+    assert not ret.success
@@ -0,0 +1,86 @@
+import hist
+import numpy as np
+import pytest
+from hist import Hist
+
+import heputils
+
+pa = pytest.importorskip("pyarrow")
+
+
+def _example_hists():
+    rng = np.random.default_rng(0)
+    hist_3d = Hist(
+        hist.axis.Regular(10, 0, 1, name="x", label="x [GeV]"),
+        hist.axis.Variable([0, 1, 5, 10], name="y", underflow=False),
+        hist.axis.StrCategory(["a", "b"], name="region", growth=True),
+        storage=hist.storage.Weight(),
+        label="Events",
+    ).fill(
+        rng.uniform(size=100),
+        rng.uniform(0, 10, size=100),
+        rng.choice(["a", "b", "c"], size=100),
+        weight=rng.uniform(size=100),
+    )
+    hist_int = Hist(
+        hist.axis.Integer(0, 5, name="n_jets"),
+        hist.axis.IntCategory([11, 13], name="lepton"),
+        hist.axis.Boolean(name="passed"),
+        storage=hist.storage.Int64(),
+    ).fill([0, 1, 1, 7], [11, 13, 13, 11], [True, False, True, True])
+    hist_circular = Hist(
+        hist.axis.Regular(4, 0, 2 * np.pi, circular=True, name="phi")
+    ).fill([0.5, 1.0, 7.0])
+    return {"3d": hist_3d, "int": hist_int, "circular": hist_circular}
+
+
+def test_arrow_round_trip():
+    hists = _example_hists()
+    table = heputils.convert.to_arrow(hists)
+    assert table.column("name").to_pylist() == list(hists)
+    assert table.column("variances").null_count == 2
+
+    read_hists = heputils.convert.from_arrow(table)
+    assert list(read_hists) == list(hists)
+    for name, _hist in hists.items():
+        read_hist = read_hists[name]
+        assert read_hist == _hist
+        assert read_hist.axes == _hist.axes
+        assert read_hist.storage_type == _hist.storage_type
+        assert read_hist.name == name
+        assert read_hist.label == _hist.label
+
+
+def test_arrow_fixed_size_lists():
+    hists, _ = heputils.benchmark.make_hists(n_bins=50, n_samples=4, n_events=100)
+    table = heputils.convert.to_arrow(
+        {f"sample_{idx}": _hist for idx, _hist in enumerate(hists)}
+    )
+    assert pa.types.is_fixed_size_list(table.schema.field("values").type)
+    assert pa.types.is_fixed_size_list(table.schema.field("variances").type)
+
+    # Views of a slice of the table share memory with the table
+    views = heputils.convert.arrow_views(table.slice(1, 2))
+    assert list(views) == ["sample_1", "sample_2"]
+    values, variances = views["sample_2"]
+    assert not values.flags.writeable
+    np.testing.assert_array_equal(values, hists[2].values())
+    np.testing.assert_array_equal(variances, hists[2].variances())
+    buffer = table.column("values").chunk(0).values.buffers()[1]
+    assert np.shares_memory(values, np.frombuffer(buffer, dtype=np.float64))
+
+
+def test_parquet_round_trip(tmp_path):
+    hists = _example_hists()
+    path = tmp_path / "hists.parquet"
+    heputils.convert.write_parquet(hists, path, compression="zstd")
+    read_hists = heputils.convert.read_parquet(path)
+    for name, _hist in hists.items():
+        assert read_hists[name] == _hist
+        assert read_hists[name].axes == _hist.axes
+
+
+def test_arrow_unsupported_storage():
+    _hist = Hist(hist.axis.Regular(4, 0, 4), storage=hist.storage.Mean())
+    with pytest.raises(ValueError, match="Mean"):
+        heputils.convert.to_arrow({"profile": _hist})
@@ -1,5 +1,26 @@
+import subprocess
+import sys
+
 import heputils
 
 
 def test_import():
     assert heputils
+
+
+def test_import_is_lazy():
+    # The heavy dependencies of the optional submodules are not imported with
+    # heputils so that the command line interface starts quickly
+    code = (
+        "import sys, heputils; "
+        "print(' '.join(sorted(name for name in "
+        "['awkward', 'scipy.special', 'scipy.stats', 'uproot', 'heputils.stats'] "
+        "if name in sys.modules)))"
+    )
+    ret = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert ret.stdout.strip() == ""
+
+    assert heputils.stats.compatibility
+    assert heputils.live.LiveHist
@@ -0,0 +1,126 @@
+import threading
+
+import awkward as ak
+import hist
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+from hist import Hist
+
+import heputils
+
+matplotlib.use("agg")
+
+
+def _live_hist(**kwargs):
+    return heputils.live.LiveHist(
+        Hist(hist.axis.Regular(10, 0, 10), storage=hist.storage.Weight()), **kwargs
+    )
+
+
+def test_live_hist_consistent_snapshots():
+    live_hist = _live_hist(publish_interval=0)
+    chunk_size = 1000
+    n_chunks = 50
+
+    def produce():
+        rng = np.random.default_rng(0)
+        for idx in range(n_chunks):
+            values = rng.uniform(0, 10, size=chunk_size)
+            if idx % 2:
+                # Jagged chunks of objects per event are filled per object
+                values = ak.unflatten(values, [chunk_size // 2, chunk_size // 2])
+            live_hist.fill(values)
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    sums = []
+    while producer.is_alive():
+        sums.append(live_hist.snapshot().sum().value)
+    producer.join()
+    live_hist.flush()
+
+    # Snapshots only ever hold whole chunks
+    assert all(_sum % chunk_size == 0 for _sum in sums)
+    assert sums == sorted(sums)
+    assert live_hist.snapshot().sum().value == n_chunks * chunk_size
+    assert live_hist.n_chunks == n_chunks
+    assert live_hist.n_entries == n_chunks * chunk_size
+
+
+def test_live_hist_publish_interval():
+    live_hist = _live_hist(publish_interval=3600)
+    live_hist.fill([1.0, 2.0])
+    assert live_hist.version == 0
+    assert live_hist.snapshot().sum().value == 0
+    live_hist.flush()
+    assert live_hist.version == 1
+    assert live_hist.snapshot().sum().value == 2
+
+
+def test_live_plot_updates_artists_in_place():
+    heputils.plot.set_style("ATLAS")
+    rng = np.random.default_rng(0)
+    samples = [_live_hist(publish_interval=0) for _ in range(3)]
+    data = heputils.live.LiveHist(
+        Hist(hist.axis.Regular(10, 0, 10)), publish_interval=0
+    )
+
+    def fill():
+        for idx, live_hist in enumerate(samples):
+            live_hist.fill(rng.uniform(0, 10, size=100 * (idx + 1)))
+        data.fill(rng.uniform(0, 10, size=600))
+
+    fig, ax = plt.subplots()
+    live_plot = heputils.live.LivePlot(
+        samples, data_hist=data, ax=ax, interval=3600, labels=["a", "b", "c"]
+    )
+    fill()
+    assert live_plot.update()
+    # Throttled, and nothing changed
+    assert not live_plot.update()
+    patches = list(ax.patches)
+    ylim = ax.get_ylim()
+
+    fill()
+    assert live_plot.update(force=True)
+    assert list(ax.patches) == patches
+    assert ax.get_ylim()[1] > ylim[1]
+
+    stack = np.cumsum([live_hist.snapshot().values() for live_hist in samples], 0)
+    steps = [patch for patch in ax.patches if hasattr(patch, "get_data")][::-1]
+    for step, top in zip(steps, stack):
+        np.testing.assert_array_equal(step.get_data().values, top)
+    stat_uncert = np.sqrt(sum(h.snapshot().variances() for h in samples))
+    band = ax.containers[0]
+    np.testing.assert_allclose([bar.get_height() for bar in band], 2 * stat_uncert)
+    data_line = ax.containers[1].lines[0]
+    np.testing.assert_array_equal(data_line.get_ydata(), data.snapshot().values())
+    plt.close(fig)
+
+
+def test_live_plot_run(tmp_path):
+    heputils.plot.set_style("ATLAS")
+    data = heputils.live.LiveHist(Hist(hist.axis.Regular(10, 0, 10)))
+    stop = threading.Event()
+
+    def produce():
+        for _ in range(5):
+            data.fill(np.random.uniform(0, 10, size=100))
+        stop.set()
+
+    fig, ax = plt.subplots()
+    live_plot = heputils.live.LivePlot(
+        data_hist=data, ax=ax, interval=0.01, output=str(tmp_path / "live.png")
+    )
+    producer = threading.Thread(target=produce)
+    producer.start()
+    live_plot.run(stop)
+    producer.join()
+
+    assert (tmp_path / "live.png").exists()
+    np.testing.assert_array_equal(
+        ax.containers[0].lines[0].get_ydata(), data.snapshot().values()
+    )
+    assert data.snapshot().sum() == 500
+    plt.close(fig)
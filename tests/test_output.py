@@ -0,0 +1,133 @@
+import hist
+import matplotlib
+import matplotlib.figure
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+from hist import Hist
+from PIL import Image
+
+import heputils
+
+matplotlib.use("agg")
+
+
+def test_pdf_book_closes_figures(tmp_path):
+    path = tmp_path / "book.pdf"
+    with heputils.output.PdfBook(str(path), index=True) as book:
+        for idx in range(3):
+            fig, ax = plt.subplots()
+            ax.plot([0, 1], [0, idx])
+            assert book.add(fig, title=f"plot {idx}") == idx + 1
+            assert not plt.get_fignums()
+    # One index page
+    assert book.n_pages == 4
+    assert path.stat().st_size > 0
+
+
+def test_batch_render_book(tmp_path):
+    heputils.plot.set_style("ATLAS")
+    hists = {
+        name: Hist(hist.axis.Regular(10, 0, 10), storage=hist.storage.Weight()).fill(
+            np.random.uniform(0, 10, size=100)
+        )
+        for name in ["ttbar", "wjets"]
+    }
+    specs = {
+        "stack": {"type": "stack", "hists": ["ttbar", "wjets"]},
+        "shape": {"type": "shape", "hists": ["ttbar", "wjets"]},
+    }
+    n_pages = heputils.batch.render_book(specs, hists, str(tmp_path / "book.pdf"))
+    assert n_pages == 3
+    assert not plt.get_fignums()
+
+
+def test_save_figure_formats_and_dpis(tmp_path):
+    fig = matplotlib.figure.Figure(figsize=(4, 3))
+    fig.add_subplot().plot([0, 1], [0, 1])
+    saved = heputils.output.save_figure(
+        fig, str(tmp_path / "plot"), formats=["pdf", "png", "svg"], dpi=[50, 100]
+    )
+    assert saved == [
+        str(tmp_path / "plot.pdf"),
+        str(tmp_path / "plot_50dpi.png"),
+        str(tmp_path / "plot_100dpi.png"),
+        str(tmp_path / "plot.svg"),
+    ]
+    assert Image.open(tmp_path / "plot_50dpi.png").size == (200, 150)
+    assert Image.open(tmp_path / "plot_100dpi.png").size == (400, 300)
+
+    assert heputils.output.save_figure(fig, str(tmp_path / "plot.v2.png"), dpi=10) == [
+        str(tmp_path / "plot.v2.png")
+    ]
+
+
+@pytest.mark.parametrize("layout", [None, "constrained"])
+def test_save_figure_matches_savefig(tmp_path, layout):
+    rc = {"savefig.bbox": "tight", "savefig.pad_inches": 0.3, "savefig.format": "pdf"}
+    with plt.rc_context(rc):
+        fig = matplotlib.figure.Figure(figsize=(4, 3), layout=layout)
+        ax = fig.add_subplot()
+        ax.plot([0, 1], [0, 1])
+        ax.set_xlabel("x")
+        fig.savefig(tmp_path / "savefig.png", dpi=100, transparent=True)
+        with plt.rc_context({"savefig.transparent": True}):
+            heputils.output.save_figure(
+                fig, str(tmp_path / "plot"), formats=["png", "pdf"], dpi=100
+            )
+    # The tight bounding box and transparency of the style apply to the PNG
+    expected = np.asarray(Image.open(tmp_path / "savefig.png"))
+    image = np.asarray(Image.open(tmp_path / "plot.png"))
+    assert image.shape[:2] != (300, 400)
+    np.testing.assert_array_equal(image, expected)
+
+
+def test_plot_output_kwarg_saves_and_closes(tmp_path):
+    heputils.plot.set_style("ATLAS")
+    _hist = Hist(hist.axis.Regular(10, 0, 10), storage=hist.storage.Weight()).fill(
+        np.random.uniform(0, 10, size=100)
+    )
+    fig, ax = plt.subplots()
+    heputils.plot.stack_hist(
+        [_hist], ax=ax, output={"path": str(tmp_path / "stack"), "formats": ["png"]}
+    )
+    assert (tmp_path / "stack.png").exists()
+    assert not plt.get_fignums()
+
+
+def test_async_saver(tmp_path):
+    heputils.plot.set_style("ATLAS")
+    _hist = Hist(hist.axis.Regular(10, 0, 10), storage=hist.storage.Weight()).fill(
+        np.random.uniform(0, 10, size=100)
+    )
+    with heputils.output.AsyncSaver(max_pending=1) as saver:
+        for idx in range(3):
+            fig, ax = plt.subplots()
+            heputils.plot.stack_hist(
+                [_hist],
+                ax=ax,
+                output={
+                    "path": str(tmp_path / "plots" / f"stack_{idx}"),
+                    "formats": ["pdf", "png"],
+                    "saver": saver,
+                },
+            )
+            # Closed once drawn, before the files are written
+            assert not plt.get_fignums()
+        future = saver.save(fig, str(tmp_path / "plots" / "cleared.png"), dpi=10)
+    assert future.result() == [str(tmp_path / "plots" / "cleared.png")]
+    assert all((tmp_path / "plots" / f"stack_{idx}.png").exists() for idx in range(3))
+
+    specs = {"stack": {"type": "stack", "hists": ["ttbar"]}}
+    with heputils.output.AsyncSaver() as saver:
+        rendered = heputils.batch.render(
+            specs, {"ttbar": _hist}, str(tmp_path / "batch"), saver=saver
+        )
+    assert rendered == {"stack": [str(tmp_path / "batch" / "stack.pdf")]}
+
+    # Errors while writing are raised in the caller
+    (tmp_path / "not_a_dir").write_text("")
+    saver = heputils.output.AsyncSaver()
+    saver.save(fig, str(tmp_path / "not_a_dir" / "plot.png"))
+    with pytest.raises(OSError):
+        saver.close()
@@ -1,9 +1,13 @@
 import hist
 import matplotlib
+import matplotlib.figure
 import matplotlib.pyplot as plt
+import mplhep
 import numpy as np
 import pytest
 from hist import Hist
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.container import BarContainer
 
 import heputils
 
@@ -92,3 +96,386 @@ def test_stack_hist_xlabel_passed_through_ax(hist_tuple):
         ax=ax,
     )
     assert ax.get_xlabel() == "test_label"
+
+
+def test_decimate_merges_bins_to_display_resolution():
+    heputils.plot.set_style("ATLAS")
+    fine_hists = [
+        Hist(
+            hist.axis.Regular(10000, -5, 5, name="x"), storage=hist.storage.Weight()
+        ).fill(np.random.normal(size=10000))
+        for _ in range(2)
+    ]
+    data = Hist(hist.axis.Regular(10000, -5, 5, name="x")).fill(
+        np.random.normal(size=20000)
+    )
+
+    fig = plt.figure()
+    main_ax, ratio_ax = heputils.plot.stack_ratio_plot(
+        fine_hists, data_hist=data, labels=["a", "b"], fig=fig, decimate=True
+    )
+    max_bins = main_ax.get_window_extent().width
+    stack_artists = [
+        artist
+        for artist in main_ax.patches
+        if isinstance(artist, matplotlib.patches.StepPatch)
+    ]
+    assert stack_artists
+    for artist in stack_artists:
+        assert len(artist.get_data().values) <= max_bins
+
+    fig, ax = plt.subplots()
+    ax = heputils.plot.data_hist(data, ax=ax, decimate=100)
+    (errorbar_line,) = [line for line in ax.lines if len(line.get_xdata()) > 1]
+    assert len(errorbar_line.get_xdata()) == 100
+    plt.close("all")
+
+
+@pytest.mark.parametrize("n_bins", [997, 1009, 1200])
+def test_decimate_flat(n_bins):
+    heputils.plot.set_style("ATLAS")
+    flat = Hist(hist.axis.Regular(n_bins, 0, 1, name="x"))
+    flat.fill(flat.axes[0].centers)
+
+    fig, ax = plt.subplots()
+    ax = heputils.plot.data_hist(flat, ax=ax, decimate=300)
+    (errorbar_line,) = [line for line in ax.lines if len(line.get_xdata()) > 1]
+    # Groups of equal size without a comb from groups of different sizes
+    heights = errorbar_line.get_ydata()
+    np.testing.assert_allclose(heights, heights[0])
+    assert ax.get_xlim() == (0, 1)
+    plt.close(fig)
+
+    sample = Hist(flat.axes[0], storage=hist.storage.Weight())
+    sample.fill(flat.axes[0].centers, weight=0.5)
+    fig = plt.figure()
+    main_ax, ratio_ax = heputils.plot.stack_ratio_plot(
+        [sample, sample], data_hist=flat, fig=fig, decimate=300
+    )
+    steps = [
+        artist
+        for artist in main_ax.patches
+        if isinstance(artist, matplotlib.patches.StepPatch)
+    ]
+    assert steps
+    for step in steps:
+        np.testing.assert_allclose(step.get_data().values, step.get_data().values[0])
+    assert main_ax.get_xlim() == (0, 1)
+    plt.close(fig)
+
+
+def test_decimate_two_sided_uncertainties():
+    heputils.plot.set_style("ATLAS")
+    data = Hist(hist.axis.Regular(100, 0, 1, name="x")).fill(
+        np.random.uniform(size=1000)
+    )
+    uncert = np.sqrt(data.values())
+
+    fig, ax = plt.subplots()
+    ax = heputils.plot.data_hist(
+        data, ax=ax, uncert=np.stack([uncert, 2 * uncert]), decimate=50
+    )
+    (errorbar_line,) = [line for line in ax.lines if len(line.get_xdata()) > 1]
+    assert len(errorbar_line.get_xdata()) == 50
+    segments = ax.collections[0].get_segments()
+    merged = np.sqrt(np.add.reduceat(data.values(), np.arange(0, 100, 2)))
+    np.testing.assert_allclose(
+        [segment[1, 1] - segment[0, 1] for segment in segments], 3 * merged
+    )
+    plt.close(fig)
+
+
+def test_figure_pool_reuses_figures(hist_tuple):
+    heputils.plot.set_style("ATLAS")
+    plt.close("all")
+    reports = []
+    with heputils.plot.FigurePool(hook=reports.append) as pool:
+        for _ in range(3):
+            with pool.figure() as fig:
+                heputils.plot.stack_ratio_plot(
+                    list(hist_tuple[:2]), data_hist=hist_tuple[-1], fig=fig
+                )
+        fig = pool.acquire()
+        assert list(fig.get_size_inches()) == plt.rcParams["figure.figsize"]
+        assert not fig.axes
+
+    assert not plt.get_fignums()
+    assert reports[-1]["figures_created"] == 1
+    assert reports[-1]["peak_figures"] == 1
+    assert reports[-1]["in_use"] == 0
+
+
+def test_stack_hist_systematic_band(hist_tuple):
+    heputils.plot.set_style("ATLAS")
+    hists = list(hist_tuple[:2])
+    n_bins = hists[0].axes[0].size
+    nominal = np.stack([h.values() for h in hists])
+    # samples x systematics x bins
+    variations = nominal[:, None, :] * np.random.uniform(0.8, 1.2, size=(2, 200, 1))
+
+    fig, ax = plt.subplots()
+    ax = heputils.plot.stack_hist(hists, ax=ax, syst_variations=variations)
+    labels = [text.get_text() for text in ax.get_legend().get_texts()]
+    assert labels[0] == "Stat + Syst Uncertainty"
+    plt.close(fig)
+
+    syst_hist = Hist(
+        hist.axis.StrCategory([f"syst_{idx}" for idx in range(3)], name="syst"),
+        hist.axis.Regular(50, -5, 5, name="x"),
+    )
+    syst_hist[...] = nominal.sum(axis=0) * np.array([0.9, 1.0, 1.1])[:, None]
+    fig = plt.figure()
+    main_ax, ratio_ax = heputils.plot.stack_ratio_plot(
+        hists,
+        data_hist=hist_tuple[-1],
+        fig=fig,
+        syst_variations=syst_hist,
+        syst_method="quadrature",
+        syst_stat=False,
+    )
+    labels = [text.get_text() for text in main_ax.get_legend().get_texts()]
+    assert labels == ["Data", "Syst Uncertainty"]
+    assert len(ratio_ax.patches) <= n_bins
+    assert ratio_ax.patches
+    plt.close(fig)
+
+
+def test_stack_hist_systematic_band_scale_factors(hist_tuple):
+    heputils.plot.set_style("ATLAS")
+    hists = list(hist_tuple[:2])
+    nominal = np.stack([h.values() for h in hists])
+    # A 1% variation of each sample, scaled like the nominal samples
+    variations = nominal[:, None, :] * np.array([0.99, 1.01])[:, None]
+
+    fig, ax = plt.subplots()
+    ax = heputils.plot.stack_hist(
+        hists,
+        ax=ax,
+        scale_factors=[2, 2],
+        syst_variations=variations,
+        syst_stat=False,
+    )
+    (band,) = [c for c in ax.containers if isinstance(c, BarContainer)]
+    heights = [bar.get_height() for bar in band]
+    np.testing.assert_allclose(heights, 0.04 * nominal.sum(axis=0))
+    plt.close(fig)
+
+    # The summed stack can not be scaled per sample
+    fig, ax = plt.subplots()
+    with pytest.raises(ValueError, match="scale_factors"):
+        heputils.plot.stack_hist(
+            hists,
+            ax=ax,
+            scale_factors=[2, 2],
+            syst_variations=variations.sum(axis=0),
+        )
+    plt.close(fig)
+    fig = plt.figure()
+    with pytest.raises(ValueError, match="scale_factors"):
+        heputils.plot.stack_ratio_plot(
+            hists,
+            data_hist=hist_tuple[-1],
+            fig=fig,
+            scale_factors=[2, 2],
+            syst_variations=variations.sum(axis=0),
+        )
+    plt.close(fig)
+
+
+def test_stack_ratio_plot_precomputed_ratio(hist_tuple):
+    heputils.plot.set_style("ATLAS")
+    hists = list(hist_tuple[:2])
+    _data_hist = hist_tuple[-1]
+    numerators = np.stack([_data_hist.values()] * 3)
+    denominators = np.stack([heputils.utils.sum_hists(hists).values()] * 3)
+    ratios, uncert = heputils.utils.ratio(numerators, denominators)
+
+    fig = plt.figure()
+    _, ratio_ax = heputils.plot.stack_ratio_plot(
+        hists, data_hist=_data_hist, fig=fig, rp_ratio=(ratios[0], uncert[:, 0])
+    )
+    assert ratio_ax.get_ylabel() == "Data/MC"
+    plt.close(fig)
+
+
+@pytest.mark.parametrize(
+    "rp_kwargs, ylabel",
+    [({}, "Efficiency"), ({"rp_ylabel": "Trigger efficiency"}, "Trigger efficiency")],
+)
+def test_stack_ratio_plot_efficiency_ylabel(hist_tuple, rp_kwargs, ylabel):
+    heputils.plot.set_style("ATLAS")
+    hists = list(hist_tuple[:2])
+
+    fig = plt.figure()
+    _, ratio_ax = heputils.plot.stack_ratio_plot(
+        hists,
+        data_hist=hists[0],
+        fig=fig,
+        rp_uncertainty_type="efficiency",
+        **rp_kwargs,
+    )
+    assert ratio_ax.get_ylabel() == ylabel
+    assert ratio_ax.get_ylim() == (0, 1.1)
+    plt.close(fig)
+
+
+def test_set_style_snapshot_matches_mplhep():
+    for style in ["CMS", "ATLAS", "LHCb2", "ATLAS"]:
+        heputils.plot.set_style(style)
+        cached = dict(plt.rcParams)
+        mplhep.style.use(style)
+        assert dict(plt.rcParams) == cached
+    assert heputils.plot.get_experiment_info()["name"] == "atlas"
+
+    with heputils.plot.style_context("CMS"):
+        assert heputils.plot.get_experiment_info()["name"] == "cms"
+        assert plt.rcParams["figure.figsize"] == [10.0, 10.0]
+    assert heputils.plot.get_experiment_info()["name"] == "atlas"
+    assert dict(plt.rcParams) == cached
+    assert heputils.plot.get_style() is plt.rcParams
+
+
+@pytest.mark.parametrize("style", ["CMS", mplhep.style.CMS])
+def test_style_context_restores_all_rcparams(style):
+    heputils.plot.set_style("ATLAS")
+    cached = dict(plt.rcParams)
+    with heputils.plot.style_context(style):
+        # Not set by the style
+        plt.rcParams["savefig.bbox"] = "tight"
+        plt.rcParams["lines.linewidth"] = 7.0
+    assert dict(plt.rcParams) == cached
+
+
+def test_shape_hist_overlay():
+    heputils.plot.set_style("ATLAS")
+    mass_points = np.linspace(100, 1000, 200)
+    hists = [
+        Hist(hist.axis.Regular(40, 0, 1200)).fill(np.random.normal(mass, 50, size=200))
+        for mass in mass_points
+    ]
+
+    fig, ax = plt.subplots()
+    ax = heputils.plot.shape_hist(
+        hists,
+        ax=ax,
+        overlay=True,
+        overlay_values=mass_points,
+        cmap="viridis",
+        colorbar_label="mass point [GeV]",
+    )
+    assert len(ax.collections) == 1
+    assert not ax.patches
+    collection = ax.collections[0]
+    np.testing.assert_array_equal(collection.get_array(), mass_points)
+    # Step outlines of the densities
+    segment = collection.get_segments()[7]
+    np.testing.assert_allclose(segment[::2, 1], hists[7].density())
+    assert len(fig.axes) == 2
+    assert fig.axes[1].get_ylabel() == "mass point [GeV]"
+    assert ax.get_ylim()[1] > max(h.density().max() for h in hists)
+    # No empty legend for the unlabeled outlines
+    assert ax.get_legend() is None
+
+    with pytest.raises(ValueError, match="labels"):
+        heputils.plot.shape_hist(
+            hists[:2], ax=ax, overlay=True, labels=["low mass", "high mass"]
+        )
+    plt.close(fig)
+
+
+def test_hist2d():
+    heputils.plot.set_style("ATLAS")
+    x, y = np.random.normal(size=(2, 5000))
+    regular = Hist(
+        hist.axis.Regular(1000, -3, 3, label="x"),
+        hist.axis.Regular(500, -3, 3, label="y"),
+    ).fill(x, y)
+
+    fig, ax = plt.subplots()
+    ax = heputils.plot.hist2d(regular, ax=ax, decimate=100)
+    image = ax.images[0]
+    assert image.get_array().shape == (100, 100)
+    assert image.get_array().sum() == regular.values().sum()
+    assert ax.get_xlabel() == "x"
+    assert len(fig.axes) == 2
+    plt.close(fig)
+
+    variable = Hist(
+        hist.axis.Variable(np.geomspace(1, 100, 201), label="x"),
+        hist.axis.Regular(100, -3, 3, label="y"),
+    ).fill(np.exp(np.abs(x) * 1.5), y)
+    fig, ax = plt.subplots()
+    ax = heputils.plot.hist2d(variable, ax=ax, logz=True, colorbar_label="Events")
+    assert not ax.images
+    mesh = ax.collections[0]
+    assert mesh.get_rasterized()
+    assert mesh.get_array().shape == (100, 200)
+    assert fig.axes[1].get_ylabel() == "Events"
+    plt.close(fig)
+
+
+@pytest.mark.parametrize("n_bins", [1000, 1009, 250])
+def test_hist2d_decimate_flat(n_bins):
+    heputils.plot.set_style("ATLAS")
+    flat = Hist(
+        hist.axis.Regular(n_bins, 0, 1, label="x"),
+        hist.axis.Regular(293, 0, 1, label="y"),
+    )
+    flat[...] = np.ones((n_bins, 293))
+
+    fig, ax = plt.subplots()
+    ax = heputils.plot.hist2d(flat, ax=ax, decimate=100)
+    assert not ax.collections
+    array = ax.images[0].get_array()
+    assert max(array.shape) <= 100
+    # Groups of equal size without structure from a shorter last group
+    np.testing.assert_allclose(array, array[0, 0])
+    assert ax.get_xlim() == (0, 1)
+    assert ax.get_ylim() == (0, 1)
+    plt.close(fig)
+
+
+def _render(draw):
+    fig = matplotlib.figure.Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    draw(ax)
+    fig.canvas.draw()
+    image = np.asarray(fig.canvas.buffer_rgba()).copy()
+    return image, ax
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"density": True},
+        {"uncert": "two_sided"},
+        {"xlabel": "mass [GeV]", "logy": True},
+    ],
+    ids=["errorbar", "density", "two_sided", "labels"],
+)
+def test_data_hist_fast_path_matches_histplot(kwargs):
+    heputils.plot.set_style("ATLAS")
+    _hist = Hist(
+        hist.axis.Variable([0, 1, 2, 4, 7, 10], label="x [units]"),
+        storage=hist.storage.Double(),
+    )
+    _hist[...] = [3, 10, 0, 25, 7]
+    if kwargs.get("uncert") == "two_sided":
+        kwargs = dict(kwargs, uncert=np.array([[1, 2, 0, 3, 1], [2, 3, 1, 5, 2]]))
+
+    fast, fast_ax = _render(lambda ax: heputils.plot.data_hist(_hist, ax=ax, **kwargs))
+    slow, slow_ax = _render(
+        lambda ax: heputils.plot.data_hist(_hist, ax=ax, fast=False, **kwargs)
+    )
+    assert fast_ax.get_xlabel() == slow_ax.get_xlabel()
+    assert fast_ax.get_ylim() == slow_ax.get_ylim()
+    np.testing.assert_array_equal(fast, slow)
+
+
+def test_data_hist_flow_falls_back_to_histplot():
+    _hist = Hist(hist.axis.Regular(5, 0, 5)).fill([1, 2, 2])
+    assert heputils.plot._draws_directly(_hist, np.sqrt(_hist.values()))
+    _hist.fill([-1])
+    assert not heputils.plot._draws_directly(_hist, np.sqrt(_hist.values()))
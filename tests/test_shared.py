@@ -0,0 +1,103 @@
+import pickle
+import sys
+
+import hist
+import matplotlib
+import numpy as np
+import pytest
+from hist import Hist
+
+import heputils
+
+matplotlib.use("agg")
+
+requires_shared_memory = pytest.mark.skipif(
+    sys.version_info < (3, 8), reason="shared memory requires Python 3.8 or later"
+)
+
+
+@requires_shared_memory
+def test_shared_hists_round_trip():
+    hist_3d = Hist(
+        hist.axis.Regular(10, 0, 1, name="x"),
+        hist.axis.Variable([0, 1, 5, 10], name="y"),
+        hist.axis.StrCategory(["a", "b"], name="region"),
+        storage=hist.storage.Weight(),
+    ).fill(
+        np.random.uniform(size=100),
+        np.random.uniform(0, 10, size=100),
+        np.random.choice(["a", "b"], size=100),
+        weight=np.random.uniform(size=100),
+    )
+    hist_1d = Hist(hist.axis.Regular(5, 0, 5)).fill([0, 1, 1, 7])
+
+    with heputils.shared.HistogramPublisher(
+        {"3d": hist_3d, "1d": hist_1d}
+    ) as publisher:
+        # Workers receive only the pickled handles
+        handles = pickle.loads(pickle.dumps(publisher.handles))
+        shared_hists = heputils.shared.attach(handles)
+
+        np.testing.assert_array_equal(shared_hists["3d"].values(), hist_3d.values())
+        np.testing.assert_array_equal(
+            shared_hists["3d"].variances(flow=True), hist_3d.variances(flow=True)
+        )
+        assert shared_hists["1d"].variances() is None
+        assert shared_hists["1d"].to_hist() == hist_1d
+        assert shared_hists["3d"].to_hist() == hist_3d
+        with pytest.raises(ValueError):
+            shared_hists["1d"].values()[0] = 1.0
+
+        del shared_hists
+        heputils.shared.detach()
+    assert publisher.nbytes == 0
+
+    with pytest.raises(FileNotFoundError):
+        heputils.shared.attach(handles)
+
+
+@requires_shared_memory
+def test_batch_render_processes(tmp_path):
+    heputils.plot.set_style("ATLAS")
+    specs = {
+        "stack": {"type": "stack", "hists": ["ttbar", "wjets"], "data": "data"},
+        "signal": {"type": "shape", "hists": ["signal"]},
+    }
+    input_hists = {
+        "ttbar": [1, 4, 9, 4, 1],
+        "wjets": [2, 3, 4, 3, 2],
+        "data": [3, 8, 12, 7, 3],
+        "signal": [0, 1, 3, 1, 0],
+    }
+    hists = {}
+    for name, counts in input_hists.items():
+        hists[name] = Hist.new.Regular(5, 0, 5, name="x").Weight()
+        hists[name][...] = np.stack([counts, counts], axis=-1)
+
+    # The worker processes attach to the histograms in shared memory
+    rendered = heputils.batch.render(
+        specs, hists, str(tmp_path / "plots"), formats=("png",), processes=2
+    )
+    assert rendered == {
+        name: [str(tmp_path / "plots" / f"{name}.png")] for name in specs
+    }
+    assert all((tmp_path / "plots" / f"{name}.png").exists() for name in specs)
+
+
+def test_batch_render_processes_without_style(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        heputils.plot,
+        "_experiment_label_info",
+        heputils.plot._experiment_label_info_defaults.copy(),
+    )
+    # Warming up a worker must not fail without an experiment style
+    heputils.plot.warmup()
+
+    _hist = Hist.new.Regular(5, 0, 5, name="x").Weight()
+    with pytest.raises(ValueError, match="style"):
+        heputils.batch.render(
+            {"signal": {"type": "shape", "hists": ["signal"]}},
+            {"signal": _hist},
+            str(tmp_path / "plots"),
+            processes=2,
+        )
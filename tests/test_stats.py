@@ -0,0 +1,92 @@
+import csv
+
+import hist
+import numpy as np
+import pytest
+from hist import Hist
+from scipy import stats
+
+import heputils
+
+
+def test_compatibility_vectorized_matches_single_region():
+    rng = np.random.default_rng(0)
+    prediction = rng.uniform(5, 50, size=(100, 20))
+    data = rng.poisson(prediction)
+    variance = 0.1 * prediction
+
+    table = heputils.stats.compatibility(data, prediction, variance)
+    assert len(table) == 100
+    for idx in [0, 42, 99]:
+        single = heputils.stats.compatibility(data[idx], prediction[idx], variance[idx])
+        for field in ["chi2", "ndf", "ks_stat", "ks_pvalue", "llr", "llr_pvalue"]:
+            assert single[field][0] == pytest.approx(table[field][idx])
+
+    assert np.all((table["chi2_pvalue"] >= 0) & (table["chi2_pvalue"] <= 1))
+    assert np.all((table["ks_pvalue"] >= 0) & (table["ks_pvalue"] <= 1))
+
+
+def test_compatibility_ignores_padded_bins():
+    data = np.array([[10.0, 20.0, np.nan], [10.0, 20.0, 30.0]])
+    prediction = np.array([[10.0, 20.0, np.nan], [10.0, 20.0, 30.0]])
+    table = heputils.stats.compatibility(data, prediction)
+    assert table["ndf"].tolist() == [2, 3]
+    assert table["chi2"].tolist() == [0.0, 0.0]
+    assert table["llr"].tolist() == [0.0, 0.0]
+
+
+def test_compatibility_ks_pvalue_near_zero_distance():
+    prediction = np.full(10, 600.0)
+    table = heputils.stats.compatibility(
+        [prediction, prediction + np.eye(10)[0]], [prediction, prediction]
+    )
+    assert table["ks_stat"][0] == 0.0
+    assert table["ks_pvalue"][0] == 1.0
+    # A near match of 6000 events is fully compatible
+    assert 0 < table["ks_stat"][1] < 1e-3
+    assert table["ks_pvalue"][1] == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize("shift", [0.0, 0.05, 0.1])
+def test_compatibility_ks_matches_unbinned(shift):
+    rng = np.random.default_rng(1)
+    data = rng.normal(shift, 1.0, size=500)
+    prediction = rng.normal(0.0, 1.0, size=100000)
+    # One bin per distinct value keeps the full unbinned information
+    values = np.unique(np.concatenate([data, prediction]))
+    edges = np.append(values, values[-1] + 1.0)
+    table = heputils.stats.compatibility(
+        np.histogram(data, edges)[0], np.histogram(prediction, edges)[0]
+    )
+    expected = stats.ks_2samp(data, prediction, method="asymp")
+    assert table["ks_stat"][0] == pytest.approx(expected.statistic)
+    assert table["ks_pvalue"][0] == pytest.approx(expected.pvalue, rel=0.05)
+
+
+def test_compare_hists(tmp_path):
+    hists = [
+        Hist(hist.axis.Regular(10, 0, 10), storage=hist.storage.Weight()).fill(
+            np.random.uniform(0, 10, size=1000)
+        )
+        for _ in range(2)
+    ]
+    data_hist = Hist(hist.axis.Regular(10, 0, 10)).fill(
+        np.random.uniform(0, 10, size=1000)
+    )
+    table = heputils.stats.compare_hists(
+        data_hist, hists, scale_factors=[0.5, 0.5], name="SR, 2 jets"
+    )
+    assert table["name"][0] == "SR, 2 jets"
+    assert table["ndf"][0] == 10
+
+    csv_path = tmp_path / "table.csv"
+    heputils.stats.write_table(table, str(csv_path))
+    with open(csv_path, newline="") as csv_file:
+        rows = list(csv.reader(csv_file))
+    assert rows[0] == list(table.dtype.names)
+    assert rows[1][:3] == ["SR, 2 jets", str(table["chi2"][0]), "10"]
+
+    pytest.importorskip("pyarrow")
+    parquet_path = tmp_path / "table.parquet"
+    heputils.stats.write_table(table, str(parquet_path))
+    assert parquet_path.exists()
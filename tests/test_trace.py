@@ -0,0 +1,54 @@
+import json
+
+import hist
+import matplotlib
+import numpy as np
+from hist import Hist
+
+import heputils
+
+matplotlib.use("agg")
+
+
+def test_profile_plot_phases(tmp_path, monkeypatch):
+    heputils.plot.set_style("ATLAS")
+    # The tight bounding box is measured in the layout phase
+    monkeypatch.setitem(matplotlib.rcParams, "savefig.bbox", "tight")
+    hists = [
+        Hist(hist.axis.Regular(20, -5, 5), storage=hist.storage.Weight()).fill(
+            np.random.normal(size=100), weight=1.0
+        )
+        for _ in range(2)
+    ]
+    data_hist = Hist(hist.axis.Regular(20, -5, 5)).fill(np.random.normal(size=200))
+
+    assert heputils.trace.current() is None
+    with heputils.trace.profile() as outer:
+        with heputils.trace.profile() as profile:
+            with heputils.plot.FigurePool() as pool, pool.figure() as fig:
+                heputils.plot.stack_ratio_plot(
+                    hists, data_hist=data_hist, fig=fig, output=str(tmp_path / "plot")
+                )
+    assert heputils.trace.current() is None
+
+    stats = profile.stats()
+    assert sorted(stats) == [
+        "histplot",
+        "label_layout",
+        "layout",
+        "legend",
+        "ratio",
+        "savefig",
+        "uncertainty",
+        "write",
+    ]
+    # Stack and data are each drawn with histplot
+    assert stats["histplot"]["count"] == 2
+    assert stats["savefig"]["total"] >= stats["savefig"]["max"] > 0
+    assert len(outer.events) == len(profile.events)
+
+    profile.save(tmp_path / "trace.json")
+    with open(tmp_path / "trace.json") as trace_file:
+        events = json.load(trace_file)["traceEvents"]
+    assert len(events) == len(profile.events)
+    assert {"name", "ph", "ts", "dur", "pid", "tid"} <= events[0].keys()
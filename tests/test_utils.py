@@ -0,0 +1,128 @@
+import hist
+import matplotlib
+import numpy as np
+import pytest
+from hist import Hist
+from hist.intervals import ratio_uncertainty
+
+import heputils
+
+matplotlib.use("agg")
+
+
+@pytest.mark.parametrize("uncertainty_type", ["poisson", "poisson-ratio"])
+def test_ratio_matches_hist_intervals(uncertainty_type):
+    rng = np.random.default_rng(0)
+    numerator = rng.poisson(20, size=(100, 30)).astype(float)
+    denominator = rng.uniform(0, 40, size=(100, 30))
+    numerator[0, 0] = 0
+    denominator[1, 1] = 0
+
+    ratios, uncert = heputils.utils.ratio(numerator, denominator, uncertainty_type)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected_ratios = numerator / denominator
+    np.testing.assert_allclose(ratios, expected_ratios)
+    np.testing.assert_allclose(
+        uncert, ratio_uncertainty(numerator, denominator, uncertainty_type)
+    )
+
+
+def test_ratio_efficiency_and_preallocated_outputs():
+    rng = np.random.default_rng(0)
+    numerator = rng.poisson(20, size=(10, 5)).astype(float)
+    denominator = numerator + rng.poisson(5, size=numerator.shape)
+
+    out = (np.empty(numerator.shape), np.empty((2,) + numerator.shape))
+    ratios, uncert = heputils.utils.ratio(
+        numerator, denominator, uncertainty_type="efficiency", out=out
+    )
+    assert ratios is out[0]
+    assert uncert is out[1]
+    np.testing.assert_allclose(
+        uncert, ratio_uncertainty(numerator, denominator, "efficiency")
+    )
+
+    with pytest.raises(ValueError):
+        heputils.utils.ratio(denominator, numerator, uncertainty_type="efficiency")
+    with pytest.raises(ValueError):
+        heputils.utils.ratio(numerator, denominator, uncertainty_type="gaussian")
+
+
+def test_rebin_to_precision():
+    rng = np.random.default_rng(0)
+    samples = [
+        Hist(
+            hist.axis.Regular(100, 0, 10, name="x"), storage=hist.storage.Weight()
+        ).fill(rng.exponential(2, size=5000))
+        for _ in range(3)
+    ]
+    data = Hist(hist.axis.Regular(100, 0, 10, name="x")).fill(
+        rng.exponential(2, size=15000)
+    )
+    target = 0.05
+
+    rebinned = heputils.utils.rebin_to_precision(samples + [data], target, samples)
+    assert len(rebinned) == 4
+    edges = rebinned[0].axes[0].edges
+    assert 1 < len(edges) - 1 < 100
+    for _hist in rebinned:
+        np.testing.assert_allclose(_hist.axes[0].edges, edges)
+
+    stack = heputils.utils.sum_hists(rebinned[:3])
+    relative_uncert = np.sqrt(stack.variances()) / stack.values()
+    assert np.all(relative_uncert[:-1] <= target)
+    # Merging preserves the totals
+    assert stack.sum().value == pytest.approx(
+        heputils.utils.sum_hists(samples).sum().value
+    )
+    assert rebinned[-1].sum() == pytest.approx(data.sum())
+
+    # Weighted samples and unweighted data mixed in the reference
+    rebinned = heputils.utils.rebin_to_precision(samples + [data], target)
+    total = heputils.utils.sum_hists(rebinned[:3]).values() + rebinned[-1].values()
+    assert np.all(1 / np.sqrt(total[:-1]) <= target)
+    assert rebinned[-1].storage_type == data.storage_type
+
+
+@pytest.mark.parametrize(
+    "n_bins, max_bins, equal",
+    [
+        (7000, 496, True),
+        (1000, 369, True),
+        (10, 20, True),
+        # Prime numbers of bins can not be split into equal groups
+        (997, 300, False),
+        (11, 4, False),
+    ],
+)
+def test_decimation_indices_equal_groups(n_bins, max_bins, equal):
+    edge_indices = heputils.utils.decimation_indices(n_bins, max_bins)
+    group_sizes = np.diff(edge_indices)
+    assert edge_indices[0] == 0
+    assert edge_indices[-1] == n_bins
+    assert max_bins // 2 <= group_sizes.size <= max_bins
+    # Only the last group may be partial
+    assert np.all(group_sizes[:-1] == group_sizes[0])
+    assert (group_sizes[-1] == group_sizes[0]) == equal
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+def test_merge_bins_pads_partial_group(weighted):
+    storage = hist.storage.Weight() if weighted else hist.storage.Int64()
+    flat = Hist(hist.axis.Regular(1009, 0, 1), storage=storage)
+    # One entry per bin
+    flat.fill(flat.axes[0].centers)
+    edge_indices = heputils.utils.decimation_indices(1009, 300)
+    merged = heputils.utils.merge_bins(flat, edge_indices, pad=True)
+
+    widths = np.diff(merged.axes[0].edges)
+    np.testing.assert_allclose(widths, widths[0])
+    assert merged.axes[0].edges[0] == 0
+    assert merged.axes[0].edges[-1] > 1
+    np.testing.assert_allclose(merged.values(), widths[0] * 1009)
+    if weighted:
+        # The variance of the partial group scales with the square of its scale
+        scale = heputils.utils.padding_scale(edge_indices)[-1]
+        assert merged.variances()[-1] == pytest.approx(scale * merged.values()[-1])
+    else:
+        assert merged.storage_type is hist.storage.Double
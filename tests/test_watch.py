@@ -0,0 +1,157 @@
+import json
+import struct
+
+import matplotlib
+import numpy as np
+import pytest
+import uproot
+from hist import Hist
+
+import heputils
+
+matplotlib.use("agg")
+
+
+def write_root_file(path, hists):
+    with uproot.recreate(path) as root_file:
+        for name, counts in hists.items():
+            _hist = Hist.new.Regular(5, 0, 5, name="x").Weight()
+            _hist[...] = np.stack([counts, counts], axis=-1)
+            root_file[name] = _hist
+
+
+@pytest.fixture
+def specs():
+    return {
+        "stack": {"type": "stack", "hists": ["ttbar", "wjets"], "data": "data"},
+        "signal": {"type": "shape", "hists": ["signal"]},
+    }
+
+
+@pytest.fixture
+def input_hists():
+    return {
+        "ttbar": [1, 4, 9, 4, 1],
+        "wjets": [2, 3, 4, 3, 2],
+        "data": [3, 8, 12, 7, 3],
+        "signal": [0, 1, 3, 1, 0],
+    }
+
+
+def test_required_hists(specs):
+    assert heputils.batch.required_hists(specs["stack"]) == {"ttbar", "wjets", "data"}
+    assert heputils.batch.required_hists({"hists": "signal"}) == {"signal"}
+
+
+def test_watcher_renders_only_affected_plots(tmp_path, specs, input_hists):
+    heputils.plot.set_style("ATLAS")
+    root_path = str(tmp_path / "example.root")
+    write_root_file(root_path, input_hists)
+
+    watcher = heputils.watch.HistogramWatcher(
+        [root_path], specs, str(tmp_path / "plots"), formats=("png",)
+    )
+    rendered = watcher.poll()
+    assert sorted(rendered) == ["signal", "stack"]
+    assert (tmp_path / "plots" / "stack.png").exists()
+
+    # Nothing changed
+    assert watcher.poll() == {}
+
+    # Rewriting with identical contents does not trigger a render
+    write_root_file(root_path, input_hists)
+    assert watcher.poll() == {}
+
+    input_hists["signal"] = [0, 2, 5, 2, 0]
+    write_root_file(root_path, input_hists)
+    rendered = watcher.poll()
+    assert list(rendered) == ["signal"]
+
+
+def test_watcher_retries_partially_read_files(
+    tmp_path, specs, input_hists, monkeypatch
+):
+    heputils.plot.set_style("ATLAS")
+    root_path = str(tmp_path / "example.root")
+    write_root_file(root_path, input_hists)
+    watcher = heputils.watch.HistogramWatcher(
+        [root_path], specs, str(tmp_path / "plots"), formats=("png",)
+    )
+
+    # Fail partway through the file as if it was caught mid-write
+    content_hash = heputils.watch.content_hash
+    calls = []
+
+    def truncated_hash(hist):
+        calls.append(hist)
+        if len(calls) == 2:
+            raise struct.error("unpack requires a buffer of 8 bytes")
+        return content_hash(hist)
+
+    monkeypatch.setattr(heputils.watch, "content_hash", truncated_hash)
+    assert watcher.poll() == {}
+    assert watcher.hists == {}
+
+    rendered = watcher.poll()
+    assert sorted(rendered) == ["signal", "stack"]
+
+
+def test_watcher_retries_failed_plots(tmp_path, specs, input_hists, monkeypatch):
+    heputils.plot.set_style("ATLAS")
+    root_path = str(tmp_path / "example.root")
+    write_root_file(root_path, input_hists)
+    watcher = heputils.watch.HistogramWatcher(
+        [root_path], specs, str(tmp_path / "plots"), formats=("png",)
+    )
+
+    draw_plot = heputils.batch.draw_plot
+    failures = []
+
+    def failing_draw_plot(spec, hists, fig):
+        if spec["type"] == "stack" and not failures:
+            failures.append(spec)
+            raise RuntimeError("failed to draw")
+        return draw_plot(spec, hists, fig)
+
+    monkeypatch.setattr(heputils.batch, "draw_plot", failing_draw_plot)
+    # The failure does not stop the watcher or the other plots
+    watcher.run(interval=0, max_polls=1)
+    assert failures
+    assert (tmp_path / "plots" / "signal.png").exists()
+    assert not (tmp_path / "plots" / "stack.png").exists()
+
+    # The failed plot is rendered again although its input did not change
+    assert list(watcher.poll()) == ["stack"]
+    assert (tmp_path / "plots" / "stack.png").exists()
+    assert watcher.poll() == {}
+
+
+def test_watcher_files_sharing_names(tmp_path, specs, input_hists):
+    heputils.plot.set_style("ATLAS")
+    first_path = str(tmp_path / "first.root")
+    last_path = str(tmp_path / "last.root")
+    write_root_file(first_path, input_hists)
+    write_root_file(last_path, dict(input_hists, signal=[0, 2, 5, 2, 0]))
+    watcher = heputils.watch.HistogramWatcher(
+        [first_path, last_path], specs, str(tmp_path / "plots"), formats=("png",)
+    )
+    watcher.poll()
+    assert watcher.hists["signal"].values().tolist() == [0, 2, 5, 2, 0]
+
+    # Changing the histogram in the first file does not override the last
+    write_root_file(first_path, dict(input_hists, signal=[1, 1, 1, 1, 1]))
+    watcher.poll()
+    assert watcher.hists["signal"].values().tolist() == [0, 2, 5, 2, 0]
+
+
+def test_batch_load_specs(tmp_path, specs):
+    spec_path = tmp_path / "plots.json"
+    spec_path.write_text(json.dumps(specs))
+    assert heputils.batch.load_specs(str(spec_path)) == specs
+
+
+def test_batch_unknown_plot_type(tmp_path, input_hists):
+    with pytest.raises(ValueError):
+        heputils.batch.render_plot(
+            {"type": "pie", "hists": ["ttbar"]}, {}, str(tmp_path / "pie")
+        )